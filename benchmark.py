@@ -0,0 +1,214 @@
+import argparse
+import contextlib
+import functools
+import io
+import json
+import math
+import platform
+import random
+import sys
+import time
+import numpy as np
+from models import District, Truck
+from main import (assign_bins_to_districts, create_trucks, generate_synthetic_waste_bins,
+                  load_waste_bins_from_csv)
+from map_coloring import map_coloring
+from route_optimization import (assign_trucks_to_districts, greedy_route_optimization,
+                                optimize_route_backtracking, optimize_route_dp)
+from spatial_index import nearest_centroids
+
+# (bins, districts) per synthetic city
+DEFAULT_SIZES = ((50, 5), (500, 20), (5000, 100), (50000, 500))
+
+
+def build_city(bin_count, district_count, seed):
+    """
+    Seeded synthetic city: bins from generate_synthetic_waste_bins and districts
+    laid out on a square grid, each adjacent to its grid neighbors.
+    """
+    random.seed(seed)
+    waste_bins = generate_synthetic_waste_bins(bin_count)
+
+    side = math.ceil(math.sqrt(district_count))
+    step = 50 / side
+    districts = [District(i + 1, f"District {i + 1}") for i in range(district_count)]
+    district_locations = {}
+    for i, district in enumerate(districts):
+        row, col = divmod(i, side)
+        district_locations[district.district_id] = ((col + 0.5) * step, (row + 0.5) * step)
+        if col > 0:
+            district.add_adjacent_district(districts[i - 1])
+        if row > 0:
+            district.add_adjacent_district(districts[i - side])
+    return districts, waste_bins, district_locations
+
+
+def build_fleet(count):
+    """Repeat the create_trucks fleet mix until there are count trucks"""
+    template = create_trucks()
+    return [Truck(i + 1, template[i % len(template)].capacity, template[i % len(template)].bin_type_specialty)
+            for i in range(count)]
+
+
+def timed(func, *args, **kwargs):
+    """Run func with stdout silenced; returns (result, seconds)"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def route_quality(route, distance):
+    return {
+        "bins": len(route),
+        "distance": round(float(distance), 4),
+        "waste_collected": round(float(sum(bin.current_level for bin in route)), 4),
+    }
+
+
+def benchmark_city(bin_count, district_count, seed, time_limit, max_trucks, sample_districts):
+    """Time every pipeline stage on one synthetic city"""
+    stages = {}
+
+    waste_bins, seconds = timed(load_waste_bins_from_csv, max_bins=bin_count)
+    stages["load_waste_bins_from_csv"] = {"seconds": seconds, "rows": len(waste_bins)}
+
+    districts, waste_bins, district_locations = build_city(bin_count, district_count, seed)
+    # Same lookup on throwaway points first, so the first KD-tree import is not timed
+    nearest_centroids(np.zeros((1, 2)), list(district_locations.values()))
+    _, seconds = timed(assign_bins_to_districts, districts, waste_bins, district_locations=district_locations)
+    stages["assign_bins_to_districts"] = {"seconds": seconds}
+
+    _, seconds = timed(map_coloring, districts)
+    stages["map_coloring"] = {
+        "seconds": seconds,
+        "colors_used": len({district.color for district in districts if district.color is not None}),
+        "uncolored": sum(1 for district in districts if district.color is None),
+    }
+
+    # Single-truck solvers on the fullest districts
+    sample = sorted(districts, key=lambda d: len(d.waste_bins), reverse=True)[:sample_districts]
+    truck = Truck(0, 1500)
+    for name, solver in (("optimize_route_backtracking",
+                          functools.partial(optimize_route_backtracking, time_limit=time_limit)),
+                         ("greedy_route_optimization", greedy_route_optimization)):
+        total_seconds, total_distance, total_waste = 0.0, 0.0, 0.0
+        for district in sample:
+            (route, distance), seconds = timed(solver, truck, district.waste_bins, (0, 0))
+            quality = route_quality(route, distance)
+            total_seconds += seconds
+            total_distance += quality["distance"]
+            total_waste += quality["waste_collected"]
+        stages[name] = {
+            "seconds": total_seconds,
+            "districts": len(sample),
+            "distance": round(total_distance, 4),
+            "waste_collected": round(total_waste, 4),
+        }
+
+    fleet = build_fleet(min(district_count, max_trucks))
+    solver = functools.partial(optimize_route_dp, time_limit=time_limit)
+    assignments, seconds = timed(assign_trucks_to_districts, fleet, districts, solver=solver)
+    stages["assign_trucks_to_districts"] = {
+        "seconds": seconds,
+        "trucks": len(fleet),
+        "districts_served": len(assignments),
+        "distance": round(sum(float(a["distance"]) for a in assignments.values()), 4),
+        "waste_collected": round(sum(float(bin.current_level) for a in assignments.values() for bin in a["route"]), 4),
+    }
+
+    for stage in stages.values():
+        stage["seconds"] = round(stage["seconds"], 6)
+    return {"bins": bin_count, "districts": district_count, "seed": seed, "stages": stages}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare stage timings and quality against a baseline run.
+    Returns a list of regression messages.
+    """
+    regressions = []
+    previous = {(run["bins"], run["districts"]): run["stages"] for run in baseline["results"]}
+    for run in results["results"]:
+        old_stages = previous.get((run["bins"], run["districts"]))
+        if old_stages is None:
+            continue
+        for name, stage in run["stages"].items():
+            old = old_stages.get(name)
+            if not old:
+                continue
+            label = f"{run['bins']} bins / {run['districts']} districts / {name}"
+            # Ignore sub-millisecond stages, where timer noise dominates
+            if stage["seconds"] > max(old["seconds"] * tolerance, old["seconds"] + 0.001):
+                regressions.append(f"{label}: {old['seconds']:.4f}s -> {stage['seconds']:.4f}s")
+            # Quality: less waste collected, or a longer route for the same waste
+            if "waste_collected" in stage and "waste_collected" in old:
+                if stage["waste_collected"] < old["waste_collected"] - 1e-6:
+                    regressions.append(f"{label}: waste collected {old['waste_collected']} -> {stage['waste_collected']}")
+                elif (stage["waste_collected"] == old["waste_collected"]
+                      and stage["distance"] > old["distance"] + 1e-6):
+                    regressions.append(f"{label}: distance {old['distance']} -> {stage['distance']}")
+    return regressions
+
+
+def parse_sizes(text):
+    """Parse "50x5,500x20" into [(50, 5), (500, 20)]"""
+    sizes = []
+    for item in text.split(","):
+        bins, districts = item.lower().split("x")
+        sizes.append((int(bins), int(districts)))
+    return sizes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, coloring and routing at scale")
+    parser.add_argument("--sizes", type=parse_sizes, default=DEFAULT_SIZES,
+                        help='cities as BINSxDISTRICTS, comma separated (default: "50x5,500x20,5000x100,50000x500")')
+    parser.add_argument("--seed", type=int, default=42, help="random seed for the synthetic cities (default: 42)")
+    parser.add_argument("--time-limit", type=float, default=1.0,
+                        help="time limit per solver call in seconds (default: 1.0)")
+    parser.add_argument("--max-trucks", type=int, default=10,
+                        help="fleet size cap for assign_trucks_to_districts (default: 10)")
+    parser.add_argument("--sample-districts", type=int, default=3,
+                        help="districts timed with the single-truck solvers (default: 3)")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="baseline JSON to check for slower stages or longer routes")
+    parser.add_argument("--tolerance", type=float, default=1.5,
+                        help="slowdown factor that counts as a regression (default: 1.5)")
+    args = parser.parse_args(argv)
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "time_limit": args.time_limit,
+        },
+        "results": [],
+    }
+    for bins, districts in args.sizes:
+        print(f"Benchmarking {bins} bins / {districts} districts...", file=sys.stderr)
+        results["results"].append(benchmark_city(bins, districts, args.seed, args.time_limit,
+                                                 args.max_trucks, args.sample_districts))
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
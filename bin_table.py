@@ -0,0 +1,345 @@
+from collections.abc import MutableSequence
+import numpy as np
+from models import EMPTYING_THRESHOLD
+
+# Bin ids are stored as numbers and shown as "bin-<number>", like the CSV loader names them
+BIN_ID_PREFIX = "bin-"
+
+# dtype of the bin and container type codes; encode_categories refuses more names than it holds
+CATEGORY_DTYPE = np.int16
+
+
+class BinTable:
+    """
+    Columnar store for waste bins.
+
+    Each attribute of WasteBin is one NumPy array, and bin and container types are
+    stored as small integer codes into `bin_type_names` / `container_type_names`.
+    A bin costs a few dozen bytes instead of a full Python object, and filters such
+    as "needs emptying" or "is recyclable" are single vectorized expressions.
+    Code that still wants objects can use `views()`, which hands out BinView
+    instances backed by the table. `readings` holds any further float32 sensor
+    columns (FL_A, VS, ...) keyed by their CSV header. `thresholds`, when set
+    (see forecast.apply_forecast), replaces EMPTYING_THRESHOLD with a level per bin.
+    """
+
+    def __init__(self, ids, x, y, levels, capacities, bin_type_codes, bin_type_names,
+                 container_type_codes, container_type_names, readings=None):
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.levels = np.asarray(levels, dtype=np.float32)
+        self.capacities = np.asarray(capacities, dtype=np.float32)
+        self.bin_type_codes = np.asarray(bin_type_codes, dtype=CATEGORY_DTYPE)
+        self.bin_type_names = list(bin_type_names)
+        self.container_type_codes = np.asarray(container_type_codes, dtype=CATEGORY_DTYPE)
+        self.container_type_names = list(container_type_names)
+        self.readings = {name: np.asarray(column, dtype=np.float32) for name, column in (readings or {}).items()}
+        self.thresholds = None
+
+    @classmethod
+    def from_columns(cls, ids, x, y, levels, capacities, bin_types, container_types, readings=None):
+        """Build a table from plain columns, encoding the type strings as categories"""
+        bin_type_codes, bin_type_names = encode_categories(bin_types)
+        container_type_codes, container_type_names = encode_categories(container_types)
+        return cls(ids, x, y, levels, capacities, bin_type_codes, bin_type_names,
+                   container_type_codes, container_type_names, readings)
+
+    @classmethod
+    def from_bins(cls, waste_bins):
+        """Build a table from WasteBin objects whose ids look like "bin-<number>" """
+        return cls.from_columns(
+            [int(str(bin.bin_id).rsplit("-", 1)[-1]) for bin in waste_bins],
+            [bin.location[0] for bin in waste_bins],
+            [bin.location[1] for bin in waste_bins],
+            [bin.current_level for bin in waste_bins],
+            [bin.capacity for bin in waste_bins],
+            [bin.bin_type for bin in waste_bins],
+            [bin.container_type for bin in waste_bins],
+        )
+
+    @classmethod
+    def concat(cls, tables):
+        """Join tables end to end, merging their type categories and common readings"""
+        tables = list(tables)
+        bin_type_names, container_type_names = [], []
+        bin_type_codes, container_type_codes = [], []
+        for table in tables:
+            bin_type_codes.append(_recode(table.bin_type_codes, table.bin_type_names, bin_type_names))
+            container_type_codes.append(_recode(table.container_type_codes, table.container_type_names,
+                                                container_type_names))
+
+        def join(column, dtype):
+            return np.concatenate([getattr(table, column) for table in tables]) if tables else np.empty(0, dtype)
+
+        return cls(
+            join("ids", np.int32), join("x", np.float64), join("y", np.float64),
+            join("levels", np.float32), join("capacities", np.float32),
+            np.concatenate(bin_type_codes) if tables else np.empty(0, CATEGORY_DTYPE), bin_type_names,
+            np.concatenate(container_type_codes) if tables else np.empty(0, CATEGORY_DTYPE), container_type_names,
+            {name: np.concatenate([table.readings[name] for table in tables])
+             for name in (tables[0].readings if tables else ())
+             if all(name in table.readings for table in tables)},
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        return BinView(self, index)
+
+    def views(self):
+        """One BinView per bin, in table order"""
+        return [BinView(self, i) for i in range(len(self))]
+
+    @property
+    def locations(self):
+        return np.column_stack((self.x, self.y))
+
+    @property
+    def emptying_needed(self):
+        """Mask of bins above the emptying threshold"""
+        return self.emptying_mask()
+
+    def emptying_mask(self, idx=slice(None)):
+        """Mask of the bins at rows idx that are above their emptying threshold"""
+        if self.thresholds is None:
+            return self.levels[idx] > EMPTYING_THRESHOLD
+        return self.levels[idx] > self.thresholds[idx]
+
+    def type_mask(self, bin_type):
+        """Mask of bins of the given bin type"""
+        if bin_type not in self.bin_type_names:
+            return np.zeros(len(self), dtype=bool)
+        return self.bin_type_codes == self.bin_type_names.index(bin_type)
+
+    def container_mask(self, container_type):
+        """Mask of bins with the given container type"""
+        if container_type not in self.container_type_names:
+            return np.zeros(len(self), dtype=bool)
+        return self.container_type_codes == self.container_type_names.index(container_type)
+
+    def nbytes(self):
+        """Memory held by the columns"""
+        return sum(column.nbytes for column in (
+            self.ids, self.x, self.y, self.levels, self.capacities,
+            self.bin_type_codes, self.container_type_codes, *self.readings.values()))
+
+
+class BinView:
+    """
+    WasteBin-compatible view of one row of a BinTable.
+    Reads and writes go straight to the table's columns.
+    """
+    __slots__ = ("table", "index")
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    def __repr__(self):
+        return f"BinView({self.bin_id!r})"
+
+    @property
+    def bin_id(self):
+        return f"{BIN_ID_PREFIX}{self.table.ids[self.index]}"
+
+    @property
+    def location(self):
+        return float(self.table.x[self.index]), float(self.table.y[self.index])
+
+    @property
+    def capacity(self):
+        return float(self.table.capacities[self.index])
+
+    @property
+    def current_level(self):
+        return float(self.table.levels[self.index])
+
+    @current_level.setter
+    def current_level(self, value):
+        self.table.levels[self.index] = value
+
+    @property
+    def emptying_needed(self):
+        thresholds = self.table.thresholds
+        threshold = EMPTYING_THRESHOLD if thresholds is None else thresholds[self.index]
+        return bool(self.table.levels[self.index] > threshold)
+
+    @property
+    def bin_type(self):
+        return self.table.bin_type_names[self.table.bin_type_codes[self.index]]
+
+    @property
+    def container_type(self):
+        return self.table.container_type_names[self.table.container_type_codes[self.index]]
+
+    @property
+    def fill_percentage(self):
+        return (self.current_level / self.capacity) * 100
+
+
+class Route(MutableSequence):
+    """
+    Route stored as an int32 array of row indices into one BinTable.
+
+    It reads and edits like the list of bins it replaces (items are BinViews), at
+    4 bytes a stop instead of a Python object, and hands its rows to vectorized
+    code through `indices` and `locations`. Bins added must be views into the
+    same table.
+    """
+
+    def __init__(self, table, indices=()):
+        self.table = table
+        self.indices = np.asarray(indices, dtype=np.int32).reshape(-1)
+
+    def __repr__(self):
+        return f"Route({[bin.bin_id for bin in self]!r})"
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return Route(self.table, self.indices[position])
+        return BinView(self.table, int(self.indices[position]))
+
+    def __iter__(self):
+        table = self.table
+        return (BinView(table, index) for index in self.indices.tolist())
+
+    def __eq__(self, other):
+        try:
+            return len(self) == len(other) and all(a.bin_id == b.bin_id for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    def _row(self, waste_bin):
+        if not isinstance(waste_bin, BinView) or waste_bin.table is not self.table:
+            raise ValueError(f"{waste_bin!r} is not a bin of this route's table")
+        return waste_bin.index
+
+    def __setitem__(self, position, value):
+        if isinstance(position, slice):
+            self.indices[position] = [self._row(bin) for bin in value]
+        else:
+            self.indices[position] = self._row(value)
+
+    def __delitem__(self, position):
+        self.indices = np.delete(self.indices, position)
+
+    def insert(self, position, value):
+        self.indices = np.insert(self.indices, min(max(position, -len(self)), len(self)), self._row(value))
+
+    def index(self, value, start=0, stop=None):
+        # Bins are matched by row, as every read hands out a new BinView
+        if isinstance(value, BinView) and value.table is self.table:
+            positions = np.arange(len(self))[start:stop]
+            found = positions[self.indices[start:stop] == value.index]
+            if len(found):
+                return int(found[0])
+        raise ValueError(f"{value!r} is not in route")
+
+    def __contains__(self, value):
+        return isinstance(value, BinView) and value.table is self.table and bool((self.indices == value.index).any())
+
+    def copy(self):
+        return Route(self.table, self.indices.copy())
+
+    @property
+    def locations(self):
+        """(stops, 2) array of the bins' locations in visiting order"""
+        return np.column_stack((self.table.x[self.indices], self.table.y[self.indices]))
+
+
+def as_route(waste_bins):
+    """
+    The bins as a Route when they are all views into one BinTable, otherwise as
+    the plain list they came in.
+    """
+    if isinstance(waste_bins, Route):
+        return waste_bins
+    table, idx = table_indices(waste_bins)
+    if table is None:
+        return waste_bins
+    return Route(table, idx)
+
+
+def route_locations(route):
+    """(stops, 2) array of a route's bin locations, for a Route or a list of bins"""
+    if isinstance(route, Route):
+        return route.locations
+    return np.array([bin.location for bin in route], dtype=np.float64).reshape(-1, 2)
+
+
+def encode_categories(values):
+    """
+    Encode strings as CATEGORY_DTYPE codes; returns the codes and the list of names.
+    Raises ValueError when there are more distinct names than the codes can number.
+    """
+    names = {}
+    codes = [names.setdefault(value, len(names)) for value in values]
+    _check_categories(names)
+    return np.array(codes, dtype=CATEGORY_DTYPE), list(names)
+
+
+def _check_categories(names):
+    limit = np.iinfo(CATEGORY_DTYPE).max + 1
+    if len(names) > limit:
+        raise ValueError(f"{len(names)} categories do not fit in {np.dtype(CATEGORY_DTYPE).name} codes (at most {limit})")
+
+
+def _recode(codes, names, merged_names):
+    """Map codes over `names` onto `merged_names`, extending it with new names"""
+    mapping = np.empty(max(len(names), 1), dtype=CATEGORY_DTYPE)
+    for i, name in enumerate(names):
+        if name not in merged_names:
+            merged_names.append(name)
+            _check_categories(merged_names)
+        mapping[i] = merged_names.index(name)
+    return mapping[codes] if len(codes) else codes
+
+
+def table_indices(waste_bins):
+    """
+    If every bin is a view into the same BinTable, return (table, row indices);
+    otherwise return (None, None).
+    """
+    if not waste_bins or not all(isinstance(bin, BinView) for bin in waste_bins):
+        return None, None
+    table = waste_bins[0].table
+    if any(bin.table is not table for bin in waste_bins):
+        return None, None
+    return table, np.fromiter((bin.index for bin in waste_bins), dtype=np.intp, count=len(waste_bins))
+
+
+def emptying_thresholds(waste_bins):
+    """
+    The level each bin must pass to need emptying: the table's forecast threshold
+    for views into a BinTable that has them, EMPTYING_THRESHOLD otherwise.
+    """
+    table, idx = table_indices(waste_bins)
+    if table is not None and table.thresholds is not None:
+        return table.thresholds[idx].tolist()
+    return [bin.table.thresholds[bin.index] if isinstance(bin, BinView) and bin.table.thresholds is not None
+            else EMPTYING_THRESHOLD for bin in waste_bins]
+
+
+def emptying_waste_by_type(waste_bins):
+    """
+    Waste volume of the bins that need emptying, per bin type. Vectorized when the
+    bins are views into one BinTable.
+    """
+    table, idx = table_indices(waste_bins)
+    if table is None:
+        totals = {}
+        for bin in waste_bins:
+            if bin.emptying_needed:
+                totals[bin.bin_type] = totals.get(bin.bin_type, 0) + bin.current_level
+        return totals
+
+    levels = table.levels[idx]
+    needed = table.emptying_mask(idx)
+    sums = np.bincount(table.bin_type_codes[idx][needed], weights=levels[needed],
+                       minlength=len(table.bin_type_names))
+    return {name: float(sums[code]) for code, name in enumerate(table.bin_type_names) if sums[code]}
@@ -0,0 +1,90 @@
+import numpy as np
+from metrics import get_metrics
+
+
+class DistanceMatrix:
+    """
+    Pairwise Euclidean distances between waste bins and the depot.
+
+    All distances are computed once with a single NumPy broadcast and stored in a
+    float32 array. Row/column 0 is the depot and bin i of the input list is at
+    index i + 1, looked up through `index` by bin_id. Build one per planning run
+    and pass it to every solver so no pair is computed twice. Subclasses for other
+    distances (see road_network.RoadDistanceMatrix) override _distances and set
+    `euclidean` to False.
+    """
+
+    euclidean = True
+
+    def __init__(self, waste_bins, depot=(0, 0)):
+        self.depot = tuple(depot)
+        self.index = {}
+        for bin in waste_bins:
+            self.index.setdefault(bin.bin_id, len(self.index) + 1)
+
+        points = np.empty((len(self.index) + 1, 2), dtype=np.float32)
+        points[0] = self.depot
+        for bin in waste_bins:
+            points[self.index[bin.bin_id]] = bin.location
+        self.points = points
+        self.matrix = self._distances(points)
+
+    def _distances(self, points):
+        x, y = points[:, 0], points[:, 1]
+        get_metrics().increment("distance_evaluations_total", len(points) ** 2)
+        return np.hypot(x[:, None] - x[None, :], y[:, None] - y[None, :])
+
+    def __len__(self):
+        return len(self.index)
+
+    def covers(self, waste_bins):
+        """Check whether every bin has a row in the matrix"""
+        return all(bin.bin_id in self.index for bin in waste_bins)
+
+    def indices(self, waste_bins):
+        """Matrix indices for a list of bins, in order"""
+        return np.array([self.index[bin.bin_id] for bin in waste_bins], dtype=np.intp)
+
+    def distance(self, bin1, bin2):
+        """Distance between two bins"""
+        return float(self.matrix[self.index[bin1.bin_id], self.index[bin2.bin_id]])
+
+    def depot_distance(self, waste_bin):
+        """Distance from the depot to a bin"""
+        return float(self.matrix[0, self.index[waste_bin.bin_id]])
+
+    def submatrix(self, waste_bins, start_point=None):
+        """
+        Distance matrix restricted to the given bins, with the start point at index 0
+        and waste_bins[i] at index i + 1. Without a start point the first leg is free,
+        matching how the solvers treat a missing start point.
+        """
+        idx = np.concatenate(([0], self.indices(waste_bins)))
+        sub = self.matrix[np.ix_(idx, idx)]
+        if start_point is None:
+            sub[0, :] = 0
+        elif tuple(start_point) != self.depot:
+            points = self.points[idx]
+            sub[0, :] = np.hypot(points[:, 0] - start_point[0], points[:, 1] - start_point[1])
+            sub[:, 0] = sub[0, :]
+        return sub
+
+    def route_distance(self, route, start_point=None):
+        """Total distance of a route, including the leg from the start point if given"""
+        if not route:
+            return 0.0
+        idx = self.indices(route)
+        total = float(self.matrix[idx[:-1], idx[1:]].sum())
+        if start_point is not None:
+            total += float(self.submatrix(route[:1], start_point)[0, 1])
+        return total
+
+
+def route_distance_matrix(waste_bins, start_point=None, dist_matrix=None):
+    """
+    Distance matrix for a solver: start point at index 0, waste_bins[i] at index i + 1.
+    Reads from the shared dist_matrix when it covers the bins, otherwise builds one.
+    """
+    if dist_matrix is None or not dist_matrix.covers(waste_bins):
+        dist_matrix = DistanceMatrix(waste_bins, start_point or (0, 0))
+    return dist_matrix.submatrix(waste_bins, start_point)
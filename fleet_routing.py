@@ -0,0 +1,291 @@
+import math
+import time
+import numpy as np
+from bin_table import as_route
+from local_search import improve_route
+from spatial_index import nearest_neighbors
+
+# Bin type every truck can take, whatever its specialty
+ANY_TRUCK_TYPE = "Mixed"
+
+
+def _types_capacity(trucks, types, cache, balance=False):
+    """
+    Largest capacity among trucks that can take every bin type in `types`, or the
+    smallest one with balance set, so that any of those trucks can run the trip
+    """
+    if types not in cache:
+        capacities = [truck.capacity for truck in trucks if _serves(truck, types)]
+        cache[types] = (min if balance else max)(capacities, default=0)
+    return cache[types]
+
+
+def _bin_types(bin):
+    return frozenset() if bin.bin_type == ANY_TRUCK_TYPE else frozenset((bin.bin_type,))
+
+
+def _serves(truck, types):
+    return not truck.bin_type_specialty or types <= {truck.bin_type_specialty}
+
+
+def _split_by_capacity(route, capacity):
+    """Consecutive pieces of a route, each as long as fits in one truckload"""
+    pieces, first, load = [], 0, 0.0
+    for i, bin in enumerate(route):
+        if i > first and load + bin.current_level > capacity:
+            pieces.append(route[first:i])
+            first, load = i, 0.0
+        load += bin.current_level
+    if len(route):
+        pieces.append(route[first:])
+    return pieces
+
+
+def _trip_distance(route, depot):
+    """Length of a trip that leaves the depot, visits route in order and returns"""
+    if not route:
+        return 0.0
+    points = [depot] + [bin.location for bin in route] + [depot]
+    return sum(math.hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(points, points[1:]))
+
+
+def savings_routes(waste_bins, trucks, depot=(0, 0), neighbors=20, balance=False):
+    """
+    Clarke-Wright savings construction of depot-to-depot trips.
+
+    Every bin starts on its own trip. Trips are joined end to end in decreasing
+    order of the saving d(depot, i) + d(depot, j) - d(i, j), as long as the joined
+    trip keeps to one bin type (besides Mixed), so specialist trucks can run it,
+    and some truck can take it: it serves that type and its capacity covers the
+    load. With balance set, every truck that serves those
+    types must be able to take it, so trips can be spread over the whole fleet
+    at the price of more, shorter trips. Savings are only computed between each
+    bin and its `neighbors` nearest bins, so the work grows with n * neighbors
+    instead of n².
+    Returns the trips as lists of bins, and the bins no truck can carry.
+    """
+    cache = {}
+    capacity = lambda types: _types_capacity(trucks, types, cache, balance)
+    unserved = [bin for bin in waste_bins if bin.current_level > capacity(_bin_types(bin))]
+    if unserved:
+        skip = {id(bin) for bin in unserved}
+        waste_bins = [bin for bin in waste_bins if id(bin) not in skip]
+    n = len(waste_bins)
+    if n == 0:
+        return [], unserved
+
+    points = np.array([bin.location for bin in waste_bins], dtype=np.float64)
+    depot_dist = np.hypot(points[:, 0] - depot[0], points[:, 1] - depot[1])
+
+    # Candidate pairs: each bin with its nearest neighbors, each pair once
+    near = nearest_neighbors(points, neighbors)
+    first = np.repeat(np.arange(n), near.shape[1])
+    second = near.ravel()
+    pairs = np.unique(np.sort(np.column_stack((first, second)), axis=1), axis=0)
+    first, second = pairs[:, 0], pairs[:, 1]
+    pair_dist = np.hypot(*(points[first] - points[second]).T)
+    saving = depot_dist[first] + depot_dist[second] - pair_dist
+    order = np.argsort(-saving, kind="stable")
+    order = order[saving[order] > 0]
+
+    # Trip per bin, held under the id of the trip; a joined trip keeps the larger id's slot
+    trip_of = list(range(n))
+    trips = {i: [i] for i in range(n)}
+    loads = {i: float(bin.current_level) for i, bin in enumerate(waste_bins)}
+    types = {i: _bin_types(bin) for i, bin in enumerate(waste_bins)}
+
+    for i, j in zip(first[order].tolist(), second[order].tolist()):
+        a, b = trip_of[i], trip_of[j]
+        if a == b:
+            continue
+        trip_a, trip_b = trips[a], trips[b]
+        # Only trip ends can be joined
+        if i != trip_a[0] and i != trip_a[-1] or j != trip_b[0] and j != trip_b[-1]:
+            continue
+        joined_types = types[a] | types[b]
+        load = loads[a] + loads[b]
+        if len(joined_types) > 1 or load > capacity(joined_types):
+            continue
+
+        # Orient the trips so that i ends the first one and j starts the second
+        if trip_a[-1] != i:
+            trip_a.reverse()
+        if trip_b[0] != j:
+            trip_b.reverse()
+        joined = trip_a + trip_b
+
+        keep, drop = (a, b) if len(trip_a) >= len(trip_b) else (b, a)
+        for k in trips[drop]:
+            trip_of[k] = keep
+        trips[keep] = joined
+        loads[keep] = load
+        types[keep] = joined_types
+        del trips[drop], loads[drop], types[drop]
+
+    routes = [[waste_bins[i] for i in trip] for trip in trips.values()]
+    return routes, unserved
+
+
+def relocate_between_trips(routes, trucks, depot=(0, 0), neighbors=10, time_limit=1.0, balance=False):
+    """
+    Move single bins between trips while that shortens the total distance.
+
+    Each bin tries to sit right before or after one of its `neighbors` nearest bins
+    on another trip, if the trip keeps to one bin type and a truck can still take
+    it (every truck serving its type, with balance set, as in savings_routes). Moves are scored by their
+    delta and applied first-improvement. Works in place and drops trips that end up
+    empty; returns the number of moves applied.
+    """
+    waste_bins = [bin for route in routes for bin in route]
+    if len(waste_bins) < 2:
+        return 0
+    position = {id(bin): i for i, bin in enumerate(waste_bins)}
+    near = nearest_neighbors([bin.location for bin in waste_bins], neighbors)
+    trip_of = [0] * len(waste_bins)
+    for t, route in enumerate(routes):
+        for bin in route:
+            trip_of[position[id(bin)]] = t
+    loads = [sum(bin.current_level for bin in route) for route in routes]
+    cache = {}
+
+    def leg(a, b):
+        a = depot if a is None else a.location
+        b = depot if b is None else b.location
+        return math.hypot(b[0] - a[0], b[1] - a[1])
+
+    def neighbors_of(route, k):
+        return (route[k - 1] if k > 0 else None), (route[k + 1] if k + 1 < len(route) else None)
+
+    start_time = time.time()
+    moves = 0
+    improved = True
+    while improved and time.time() - start_time <= time_limit:
+        improved = False
+        for i, bin in enumerate(waste_bins):
+            source = routes[trip_of[i]]
+            k = source.index(bin)
+            prev, after = neighbors_of(source, k)
+            removal_gain = leg(prev, bin) + leg(bin, after) - leg(prev, after)
+
+            best_delta, best_move = -1e-6, None
+            for j in near[i]:
+                t = trip_of[j]
+                if t == trip_of[i]:
+                    continue
+                target = routes[t]
+                load = loads[t] + bin.current_level
+                types = frozenset().union(*(_bin_types(b) for b in target), _bin_types(bin))
+                if len(types) > 1 or load > _types_capacity(trucks, types, cache, balance):
+                    continue
+                q = target.index(waste_bins[j])
+                # Insert before (slot q) or after (slot q + 1) the neighbor
+                for slot in (q, q + 1):
+                    before = target[slot - 1] if slot > 0 else None
+                    following = target[slot] if slot < len(target) else None
+                    delta = leg(before, bin) + leg(bin, following) - leg(before, following) - removal_gain
+                    if delta < best_delta:
+                        best_delta, best_move = delta, (t, slot)
+
+            if best_move is not None:
+                t, slot = best_move
+                source.pop(k)
+                loads[trip_of[i]] -= bin.current_level
+                routes[t].insert(slot, bin)
+                loads[t] += bin.current_level
+                trip_of[i] = t
+                moves += 1
+                improved = True
+            if time.time() - start_time > time_limit:
+                break
+
+    routes[:] = [route for route in routes if route]
+    return moves
+
+
+def plan_fleet_routes(trucks, districts, depot=(0, 0), neighbors=20, local_search_time=1.0, balance=False):
+    """
+    Fleet-level capacitated routing (CVRP) over every bin that needs emptying.
+
+    Unlike assign_trucks_to_districts, bins are not tied to one truck per district:
+    trips are built over the whole city with savings_routes, tightened with
+    relocate_between_trips and the closed-tour 2-opt / Or-opt local search, and
+    then handed out longest trip first, each to the truck serving its bin type
+    that would finish its work soonest with it, so the longest day (makespan) in
+    distance stays short. A truck may run several trips, returning to the depot
+    to unload between them, and a trip may cross district borders. Trips keep to
+    one bin type, so specialist trucks get work too. local_search_time bounds the
+    relocation pass and the local search of each trip.
+
+    By default trips fill the largest truck that can take them, which gives the
+    fewest kilometres; a smaller truck that would finish sooner still takes the
+    trip, split into as many truckloads as it needs, so no truck stays idle while
+    another has a long day. balance sizes trips for the smallest such truck
+    instead, so any of them can run any trip unsplit, at the price of more,
+    shorter trips.
+
+    Returns (assignments, unserved). assignments maps truck_id to a dict with the
+    truck, its "trips" (each with "route", "distance", "load" and "districts"),
+    the whole "route" in trip order, and its total "distance" and "load".
+    unserved lists the bins no truck can carry.
+    """
+    district_of = {}
+    waste_bins = []
+    for district in districts:
+        for bin in district.waste_bins:
+            if bin.emptying_needed:
+                district_of[bin.bin_id] = district.district_id
+                waste_bins.append(bin)
+
+    routes, unserved = savings_routes(waste_bins, trucks, depot, neighbors, balance)
+    if local_search_time > 0:
+        relocate_between_trips(routes, trucks, depot, time_limit=local_search_time, balance=balance)
+
+    trips = []
+    for route in routes:
+        distance = _trip_distance(route, depot)
+        if local_search_time > 0 and len(route) > 2:
+            improved, improved_distance, saved = improve_route(route, depot, time_limit=local_search_time,
+                                                               closed=True)
+            if saved > 0:
+                route, distance = improved, improved_distance
+        types = frozenset().union(*(_bin_types(bin) for bin in route))
+        trips.append({
+            "route": as_route(route),
+            "distance": float(distance),
+            "load": float(sum(bin.current_level for bin in route)),
+            "districts": sorted({district_of[bin.bin_id] for bin in route}),
+            "types": types,
+        })
+
+    # Longest trip first, each to the truck that would finish soonest with it; a
+    # truck smaller than the trip runs it in pieces that each fit one truckload
+    assignments = {}
+    busy = {truck.truck_id: 0.0 for truck in trucks}
+    for trip in sorted(trips, key=lambda trip: trip["distance"], reverse=True):
+        types = trip.pop("types")
+        options = []
+        for truck in trucks:
+            if not _serves(truck, types) or any(bin.current_level > truck.capacity for bin in trip["route"]):
+                continue
+            if trip["load"] <= truck.capacity:
+                pieces = [trip]
+            else:
+                pieces = [{
+                    "route": piece,
+                    "distance": _trip_distance(piece, depot),
+                    "load": float(sum(bin.current_level for bin in piece)),
+                    "districts": sorted({district_of[bin.bin_id] for bin in piece}),
+                } for piece in _split_by_capacity(trip["route"], truck.capacity)]
+            distance = sum(piece["distance"] for piece in pieces)
+            options.append((busy[truck.truck_id] + distance, distance, -truck.capacity, truck.truck_id, truck, pieces))
+        finish, distance, _, _, truck, pieces = min(options, key=lambda option: option[:4])
+        busy[truck.truck_id] = finish
+        assignment = assignments.setdefault(truck.truck_id, {"truck": truck, "trips": []})
+        assignment["trips"].extend(pieces)
+
+    for assignment in assignments.values():
+        assignment["route"] = as_route([bin for trip in assignment["trips"] for bin in trip["route"]])
+        assignment["distance"] = sum(trip["distance"] for trip in assignment["trips"])
+        assignment["load"] = sum(trip["load"] for trip in assignment["trips"])
+        assignment["truck"].route = assignment["route"]
+    return assignments, unserved
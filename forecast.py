@@ -0,0 +1,90 @@
+import time
+import numpy as np
+from models import EMPTYING_THRESHOLD
+
+# Earlier readings of Smart_Bin.csv by how many hours before FL_B they were taken:
+# the level then (FL_B_*) and the level right after that collection (FL_A_*)
+HISTORY_COLUMNS = {3: ("FL_B_3", "FL_A_3"), 12: ("FL_B_12", "FL_A_12")}
+
+# Hours until the bins are collected when none are given
+DEFAULT_FORECAST_HOURS = 4.0
+
+# Fill level (percent) a bin should not pass before it is collected
+FULL_LEVEL = 90.0
+
+
+def fill_rates(table):
+    """
+    Fill rate of every bin in percent per hour, from the history columns in one pass.
+
+    Each earlier reading gives the growth since then divided by its age. When the
+    level is lower now than it was, the bin was emptied in between and the growth
+    is counted from the level after that collection instead. The rate is the mean
+    of the estimates a bin has (missing readings are skipped), never negative,
+    and 0 for bins with no history.
+    """
+    levels = table.levels
+    estimates = []
+    for hours, (before, after) in HISTORY_COLUMNS.items():
+        if before not in table.readings:
+            continue
+        past = table.readings[before]
+        emptied = table.readings.get(after, np.full_like(past, np.nan))
+        growth = np.where(levels >= past, levels - past, levels - emptied)
+        estimates.append(np.maximum(growth, 0) / np.float32(hours))
+    if not estimates:
+        return np.zeros(len(table), dtype=np.float32)
+
+    estimates = np.stack(estimates)
+    known = ~np.isnan(estimates)
+    count = known.sum(axis=0)
+    total = np.where(known, estimates, 0).sum(axis=0)
+    return np.where(count > 0, total / np.maximum(count, 1), 0).astype(np.float32)
+
+
+def forecast_levels(table, hours=DEFAULT_FORECAST_HOURS):
+    """Projected fill level of every bin `hours` from now"""
+    return table.levels + fill_rates(table) * np.float32(hours)
+
+
+def apply_forecast(table, hours=DEFAULT_FORECAST_HOURS, full_level=FULL_LEVEL):
+    """
+    Mark for collection only the bins projected to pass full_level within `hours`.
+
+    Sets table.thresholds to full_level minus each bin's projected growth, so the
+    bins' emptying_needed (and everything that filters on it, down to the solvers'
+    candidate sets) follows the forecast, including level updates made later.
+    Returns a report: the bins marked before and after, the prune ratio (share of
+    the previously marked bins no longer marked, negative when more are marked),
+    and the forecast time in total and per million bins.
+    """
+    start = time.perf_counter()
+    thresholds = np.float32(full_level) - fill_rates(table) * np.float32(hours)
+    seconds = time.perf_counter() - start
+
+    before = int(table.emptying_needed.sum())
+    table.thresholds = thresholds
+    after = int(table.emptying_needed.sum())
+    return {
+        "bins": len(table),
+        "hours": hours,
+        "full_level": full_level,
+        "marked_before": before,
+        "marked": after,
+        "prune_ratio": 1 - after / before if before else 0.0,
+        "seconds": seconds,
+        "seconds_per_million": seconds / len(table) * 1e6 if len(table) else 0.0,
+    }
+
+
+def clear_forecast(table):
+    """Go back to the fixed EMPTYING_THRESHOLD"""
+    table.thresholds = None
+
+
+def print_forecast(report):
+    """Print a report from apply_forecast"""
+    print(f"Forecast: {report['marked']} of {report['bins']} bins projected over {report['full_level']:.0f}% "
+          f"within {report['hours']:g}h ({report['marked_before']} over {EMPTYING_THRESHOLD}% now, "
+          f"{report['prune_ratio']:.0%} pruned) in {report['seconds'] * 1000:.2f} ms "
+          f"({report['seconds_per_million']:.3f} s per million bins)")
@@ -0,0 +1,197 @@
+import math
+from bin_table import as_route
+from route_optimization import district_waste_stats, trips_distance
+
+# Keys of district_waste_stats per bin type
+STATS_KEYS = {"Recyclable": "recyclable", "Non Recyclable": "non_recyclable", "Mixed": "mixed"}
+
+
+class IncrementalPlanner:
+    """
+    Keeps a plan from assign_trucks_to_districts in step with live fill levels.
+
+    apply_updates takes new sensor readings and touches only what they affect:
+    the bins' levels (and so emptying_needed), the district_stats that
+    assign_trucks_to_districts ranks districts by, and the routes that now hold a
+    bin that no longer needs emptying, hold too much waste, or miss a bin that
+    does need emptying. Routes are repaired in place with cheapest removal and
+    cheapest insertion, so nothing is re-solved from scratch. Each trip of a
+    route that unloads on the way (see optimize_route_clustered) is checked
+    against the truck's capacity on its own, and the assignment's "route" and
+    "trips" are kept in step.
+
+    Distances are straight lines, or with the RoadNetwork the plan was made on,
+    road distances from a RoadDistanceMatrix per district (start point as the
+    depot), so repaired routes are costed the same way they were planned.
+    """
+
+    def __init__(self, districts, assignments, start_point=(0, 0), network=None):
+        self.start_point = start_point
+        self.assignments = assignments
+        self.network = network
+        self.districts = {district.district_id: district for district in districts}
+        self.dist_matrices = {}
+        self.district_stats = {district.district_id: district_waste_stats(district) for district in districts}
+        self.bins = {}
+        self.bin_district = {}
+        for district in districts:
+            for bin in district.waste_bins:
+                self.bins[bin.bin_id] = bin
+                self.bin_district[bin.bin_id] = district.district_id
+
+        # The trips of each route, which district and trip each bin is on, and
+        # how much waste each trip collects
+        self.trips = {}
+        self.route_of = {}
+        self.loads = {}
+        for district_id, assignment in assignments.items():
+            trips = [trip["route"] for trip in assignment.get("trips", ())] or [assignment["route"]]
+            self.trips[district_id] = trips
+            self.loads[district_id] = [sum(bin.current_level for bin in trip) for trip in trips]
+            for k, trip in enumerate(trips):
+                for bin in trip:
+                    self.route_of[bin.bin_id] = (district_id, k)
+
+    def apply_updates(self, updates):
+        """
+        Apply (bin_id, fill_level) readings. Returns the ids of the districts whose
+        route changed; readings for unknown bins are ignored.
+        """
+        touched = {}
+        for bin_id, level in updates:
+            bin = self.bins.get(bin_id)
+            if bin is None:
+                continue
+            district_id = self.bin_district[bin_id]
+            self._update_stats(district_id, bin, -1)
+            on_route = self.route_of.get(bin_id)
+            if on_route:
+                self.loads[on_route[0]][on_route[1]] += level - bin.current_level
+            bin.current_level = level
+            self._update_stats(district_id, bin, 1)
+            touched.setdefault(district_id, {})[bin_id] = bin
+
+        changed = set()
+        for district_id, bins in touched.items():
+            if district_id in self.assignments and self._repair(district_id, bins.values()):
+                changed.add(district_id)
+        return changed
+
+    def unserved_districts(self):
+        """Districts with waste to collect but no truck in the plan; they need a full re-plan"""
+        return [district_id for district_id, stats in self.district_stats.items()
+                if stats["volume"] > 0 and district_id not in self.assignments]
+
+    def _update_stats(self, district_id, bin, sign):
+        if not bin.emptying_needed:
+            return
+        stats = self.district_stats[district_id]
+        stats["volume"] += sign * bin.current_level
+        key = STATS_KEYS.get(bin.bin_type)
+        if key:
+            stats[key] += sign * bin.current_level
+            stats["total"] += sign * bin.current_level
+
+    def _leg(self, a, b):
+        a = self.start_point if a is None else a.location
+        b = self.start_point if b is None else b.location
+        return math.hypot(b[0] - a[0], b[1] - a[1])
+
+    def _leg_of(self, district_id):
+        """leg(a, b) in the district's distance backend, with None for the start point"""
+        if self.network is None:
+            return self._leg
+        dist_matrix = self.dist_matrices.get(district_id)
+        if dist_matrix is None:
+            dist_matrix = self.network.distance_matrix(self.districts[district_id].waste_bins, self.start_point)
+            self.dist_matrices[district_id] = dist_matrix
+
+        def leg(a, b):
+            if a is None or b is None:
+                return 0.0 if a is b else dist_matrix.depot_distance(a or b)
+            return dist_matrix.distance(a, b)
+        return leg
+
+    def _removal_saving(self, leg, route, i):
+        prev = route[i - 1] if i > 0 else None
+        if prev is None and self.start_point is None:
+            saving = 0.0
+        else:
+            saving = leg(prev, route[i])
+        if i + 1 < len(route):
+            saving += leg(route[i], route[i + 1])
+            if prev is not None or self.start_point is not None:
+                saving -= leg(prev, route[i + 1])
+        return saving
+
+    def _cheapest_insertion(self, leg, route, bin):
+        best_position, best_cost = 0, float('inf')
+        for i in range(len(route) + 1):
+            prev = route[i - 1] if i > 0 else None
+            cost = 0.0 if prev is None and self.start_point is None else leg(prev, bin)
+            if i < len(route):
+                cost += leg(bin, route[i])
+                if prev is not None or self.start_point is not None:
+                    cost -= leg(prev, route[i])
+            if cost < best_cost:
+                best_position, best_cost = i, cost
+        return best_position, best_cost
+
+    def _repair(self, district_id, bins):
+        assignment = self.assignments[district_id]
+        truck = assignment["truck"]
+        trips = self.trips[district_id]
+        loads = self.loads[district_id]
+        leg = self._leg_of(district_id)
+        changed = False
+
+        # Drop bins that no longer need emptying
+        for bin in bins:
+            if bin.bin_id in self.route_of and not bin.emptying_needed:
+                _, k = self.route_of.pop(bin.bin_id)
+                trips[k].remove(bin)
+                loads[k] -= bin.current_level
+                changed = True
+
+        # Shed the cheapest-to-skip bins until every trip fits the truck again
+        for k, trip in enumerate(trips):
+            while trip and loads[k] > truck.capacity:
+                i = max(range(len(trip)), key=lambda i: self._removal_saving(leg, trip, i) / max(trip[i].current_level, 1e-9))
+                bin = trip.pop(i)
+                del self.route_of[bin.bin_id]
+                loads[k] -= bin.current_level
+                changed = True
+
+        # Add bins that now need emptying, fullest first, to the trip where they are cheapest and still fit
+        for bin in sorted(bins, key=lambda b: b.current_level, reverse=True):
+            if bin.bin_id in self.route_of or not bin.emptying_needed:
+                continue
+            if (truck.bin_type_specialty and bin.bin_type != truck.bin_type_specialty
+                    and bin.bin_type != "Mixed"):
+                continue
+            best = None
+            for k, trip in enumerate(trips):
+                if loads[k] + bin.current_level > truck.capacity:
+                    continue
+                position, cost = self._cheapest_insertion(leg, trip, bin)
+                if best is None or cost < best[2]:
+                    best = (k, position, cost)
+            if best is None:
+                continue
+            k, position, _ = best
+            trips[k].insert(position, bin)
+            self.route_of[bin.bin_id] = (district_id, k)
+            loads[k] += bin.current_level
+            changed = True
+
+        if changed:
+            route = as_route([bin for trip in trips for bin in trip])
+            assignment["route"] = route
+            assignment["trips"] = [{"route": trip, "load": float(load)} for trip, load in zip(trips, loads)]
+            assignment["distance"] = trips_distance([trip for trip in trips if len(trip)], self.start_point, leg)
+            truck.route = route
+        else:
+            # New levels of bins already on the route still change what its trips carry
+            for trip, load in zip(assignment.get("trips", ()), loads):
+                trip["load"] = float(load)
+        return changed
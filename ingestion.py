@@ -0,0 +1,82 @@
+import csv
+import random
+import time
+import numpy as np
+from bin_table import BinTable
+
+# Numeric sensor columns of Smart_Bin.csv, parsed into float32 arrays
+NUMERIC_COLUMNS = ("FL_B", "FL_A", "VS", "FL_B_3", "FL_A_3", "FL_B_12", "FL_A_12")
+
+# Fill level used when a row has no FL_B reading, as in the original loader
+DEFAULT_FILL_LEVEL = 50
+
+
+def _parse_floats(values, default):
+    return np.fromiter((float(value) if value else default for value in values),
+                       dtype=np.float32, count=len(values))
+
+
+def iter_bin_chunks(path="Smart_Bin.csv", chunk_size=65536, max_bins=None, first_id=1, rng=random):
+    """
+    Stream Smart_Bin.csv as BinTable chunks of at most chunk_size bins.
+
+    Rows are read with the C csv reader and every numeric column is parsed straight
+    into a float32 array, so memory stays bounded by one chunk no matter how large
+    the file is. Locations are drawn from rng.uniform(0, 50) per row, in the same
+    order as the original loader. max_bins=None reads the whole file.
+    """
+    with open(path, 'r', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        column = {name: header.index(name) for name in header}
+        numeric = [name for name in NUMERIC_COLUMNS if name in column]
+        bin_id = first_id
+        remaining = max_bins
+
+        while remaining is None or remaining > 0:
+            limit = chunk_size if remaining is None else min(chunk_size, remaining)
+            rows = [row for _, row in zip(range(limit), reader)]
+            if not rows:
+                break
+
+            xs = np.empty(len(rows))
+            ys = np.empty(len(rows))
+            for i in range(len(rows)):
+                xs[i] = rng.uniform(0, 50)
+                ys[i] = rng.uniform(0, 50)
+
+            readings = {
+                name: _parse_floats([row[column[name]] for row in rows],
+                                    DEFAULT_FILL_LEVEL if name == "FL_B" else np.nan)
+                for name in numeric
+            }
+            levels = readings.pop("FL_B") if "FL_B" in readings else np.full(len(rows), DEFAULT_FILL_LEVEL)
+
+            yield BinTable.from_columns(
+                np.arange(bin_id, bin_id + len(rows)),
+                xs, ys, levels,
+                np.full(len(rows), 100),  # Assuming 100% max
+                [row[column['Recyclable fraction']] for row in rows],
+                [row[column['Container Type']] for row in rows],
+                readings,
+            )
+
+            bin_id += len(rows)
+            if remaining is not None:
+                remaining -= len(rows)
+            if len(rows) < limit:
+                break
+
+
+def load_bin_table(path="Smart_Bin.csv", chunk_size=65536, max_bins=None, report=True):
+    """
+    Load the whole bin file (or its first max_bins rows) into one BinTable by
+    streaming it in chunks. Prints the ingest rate when report is set.
+    """
+    start_time = time.time()
+    table = BinTable.concat(iter_bin_chunks(path, chunk_size, max_bins))
+    elapsed = time.time() - start_time
+    if report:
+        rate = len(table) / elapsed if elapsed > 0 else float('inf')
+        print(f"Ingested {len(table)} rows from {path} in {elapsed:.2f} seconds ({rate:,.0f} rows/s)")
+    return table
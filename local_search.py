@@ -0,0 +1,151 @@
+import time
+import numpy as np
+from distance_matrix import route_distance_matrix
+from metrics import get_metrics
+
+# Moves must gain at least this much, so float rounding cannot make the search cycle
+MIN_GAIN = 1e-6
+
+
+def _path_cost(dist, tour):
+    return float(dist[tour[:-1], tour[1:]].sum())
+
+
+def improve_route(route, start_point=None, dist_matrix=None, time_limit=1.0, max_iterations=10000, neighbors=8,
+                  closed=False):
+    """
+    Improve a route with 2-opt and Or-opt moves.
+    Returns the improved route, its distance and the distance saved.
+
+    The route is treated as an open path from start_point (which stays first) to
+    its last bin, the same way the solvers measure it, and the set of bins never
+    changes, so capacity stays feasible. Each node only tries moves that create
+    an edge to one of its nearest `neighbors` bins, and every move is scored by
+    its delta before it is applied. With closed=True the route also returns to
+    start_point after its last bin, and that leg counts towards the distance.
+
+    Args:
+        route: List of waste bins in visiting order
+        start_point: Starting location coordinates (x,y)
+        dist_matrix: Shared DistanceMatrix to read distances from
+        time_limit: Maximum time in seconds to spend improving the route
+        max_iterations: Maximum number of improving moves to apply
+        neighbors: Number of nearest bins each bin tries to connect to
+        closed: Whether the route ends with a return to start_point
+    """
+    if not route:
+        return [], 0.0, 0.0
+    if len(route) == 1:
+        leg = float(route_distance_matrix(route, start_point, dist_matrix)[0, 1])
+        return list(route), 2 * leg if closed else leg, 0.0
+
+    dist = route_distance_matrix(route, start_point, dist_matrix).astype(float)
+    n = len(route)
+    if closed:
+        # Node n + 1 is the start point again, pinned to the end of the tour
+        dist = np.pad(dist, ((0, 1), (0, 1)))
+        dist[n + 1, :] = dist[0, :]
+        dist[:, n + 1] = dist[:, 0]
+        dist[n + 1, n + 1] = 0.0
+
+    # Nearest bins of every node (node 0 is the start point, bin i is node i + 1)
+    bin_dist = dist[1:n + 1, 1:n + 1] + np.diag(np.full(n, np.inf))
+    k = min(neighbors, n - 1)
+    near = np.argsort(bin_dist, axis=1)[:, :k] + 1
+    neighbor_lists = [[int(c) for c in np.argsort(dist[0, 1:n + 1])[:k] + 1]]
+    neighbor_lists += [[int(c) for c in row] for row in near]
+
+    tour = list(range(n + 2 if closed else n + 1))
+    end = len(tour) - 1
+    initial = _path_cost(dist, np.array(tour))
+    start_time = time.time()
+    iterations = 0
+
+    def out_of_budget():
+        return iterations >= max_iterations or time.time() - start_time > time_limit
+
+    improved = True
+    while improved and not out_of_budget():
+        improved = False
+        pos = [0] * len(tour)
+        for i, node in enumerate(tour):
+            pos[node] = i
+
+        # 2-opt: reverse part of the tour so that a connects to its neighbor c
+        for a in range(n + 1):
+            i = pos[a]
+            if i == end:
+                continue
+            succ_a = tour[i + 1]
+            for c in neighbor_lists[a]:
+                if dist[a, c] >= dist[a, succ_a]:
+                    break
+                j = pos[c]
+                if j > i + 1:
+                    lo, hi = i, j
+                elif j < i - 1:
+                    # c comes first: reversing tour[j+1..i] links c to a instead
+                    lo, hi = j, i
+                else:
+                    continue
+                first, last = tour[lo + 1], tour[hi]
+                after = tour[hi + 1] if hi < end else None
+                delta = dist[tour[lo], last] - dist[tour[lo], first]
+                if after is not None:
+                    delta += dist[first, after] - dist[last, after]
+                if delta < -MIN_GAIN:
+                    tour[lo + 1:hi + 1] = tour[lo + 1:hi + 1][::-1]
+                    for p in range(lo + 1, hi + 1):
+                        pos[tour[p]] = p
+                    iterations += 1
+                    improved = True
+                    break
+            if out_of_budget():
+                break
+
+        # Or-opt: move a segment of 1-3 bins, possibly reversed, next to a neighbor
+        for length in (1, 2, 3):
+            i = 1
+            while i + length - 1 <= n and not out_of_budget():
+                segment = tour[i:i + length]
+                head, tail = segment[0], segment[-1]
+                prev = tour[i - 1]
+                after = tour[i + length] if i + length <= end else None
+                removal_gain = dist[prev, head]
+                if after is not None:
+                    removal_gain += dist[tail, after] - dist[prev, after]
+
+                best_delta, best_move = -MIN_GAIN, None
+                for c in set(neighbor_lists[head]) | set(neighbor_lists[tail]) | {0}:
+                    q = pos[c]
+                    if i <= q < i + length:
+                        continue
+                    # The node that follows c once the segment is taken out
+                    if q == i - 1:
+                        succ = after
+                    else:
+                        succ = tour[q + 1] if q < end else None
+                    for first, last in ((head, tail), (tail, head)):
+                        insert_cost = dist[c, first]
+                        if succ is not None:
+                            insert_cost += dist[last, succ] - dist[c, succ]
+                        delta = insert_cost - removal_gain
+                        if delta < best_delta:
+                            best_delta, best_move = delta, (c, first == tail)
+
+                if best_move is not None:
+                    c, reverse = best_move
+                    moved = segment[::-1] if reverse else segment
+                    rest = tour[:i] + tour[i + length:]
+                    p = rest.index(c)
+                    tour = rest[:p + 1] + moved + rest[p + 1:]
+                    for p, node in enumerate(tour):
+                        pos[node] = p
+                    iterations += 1
+                    improved = True
+                i += 1
+
+    get_metrics().increment("local_search_moves_total", iterations)
+    final = _path_cost(dist, np.array(tour))
+    improved_route = [route[node - 1] for node in tour[1:n + 1]]
+    return improved_route, final, max(initial - final, 0.0)
@@ -1,11 +1,33 @@
+import argparse
 import random
 import csv
-import matplotlib.pyplot as plt
+import json
 import numpy as np
 import time
-from models import District, WasteBin, Truck
+from models import District, Truck
+from bin_table import BinTable, route_locations, table_indices
+from ingestion import load_bin_table
+from snapshot import load_snapshot, save_snapshot
 from map_coloring import map_coloring, visualize_districts
-from route_optimization import assign_trucks_to_districts, optimize_route_backtracking
+from route_optimization import (assign_trucks_to_districts, optimize_route_backtracking, optimize_route_clustered,
+                                optimize_route_dp)
+from fleet_routing import plan_fleet_routes
+from scheduling import print_timetable, schedule_collection
+from spatial_index import nearest_centroids
+from metrics import enable_metrics, get_metrics
+from route_cache import RouteCache
+from road_network import load_road_network
+from forecast import DEFAULT_FORECAST_HOURS, FULL_LEVEL, apply_forecast, print_forecast
+from route_export import export_routes
+
+# Files a snapshot is checked against before it is reused
+SNAPSHOT_SOURCES = ('Smart_Bin.csv', 'data/districts.csv', 'data/district_adjacency.csv')
+
+# Rough number of bin ids labelled on the route plot; small plans label every 3rd bin
+ROUTE_LABELS = 60
+
+# Route plots with more stops than this skip bin id labels and antialiasing
+ROUTE_DETAIL_MAX_STOPS = 2000
 
 def load_districts_from_csv():
     """Load district data from CSV files"""
@@ -56,70 +78,37 @@ def load_districts_from_csv():
     return list(districts.values())
 
 def load_waste_bins_from_csv(max_bins=100):
-    """Load waste bin data from Smart_Bin.csv with a limit to improve performance"""
-    waste_bins = []
-    bin_id = 1
-    
+    """
+    Load waste bin data from Smart_Bin.csv, streamed in chunks into a BinTable.
+    Returns views into the table; max_bins=None loads the whole file.
+    """
     try:
-        with open('Smart_Bin.csv', 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                # Generate location - we'll use random coordinates within city bounds
-                x = random.uniform(0, 50)
-                y = random.uniform(0, 50)
-                location = (x, y)
-                
-                # Extract fill level and waste type from dataset
-                fill_level = float(row['FL_B']) if row['FL_B'] else 50  # Use FL_B (fill level before)
-                container_type = row['Container Type']
-                bin_type = row['Recyclable fraction']
-                
-                # Create waste bin object
-                waste_bin = WasteBin(
-                    bin_id=f"bin-{bin_id}",
-                    location=location,
-                    fill_level=fill_level,
-                    capacity=100,  # Assuming 100% max
-                    bin_type=bin_type,
-                    container_type=container_type
-                )
-                bin_id += 1
-                waste_bins.append(waste_bin)
-                
-                # Limit to max_bins for better performance
-                if bin_id > max_bins:
-                    break
-                    
+        table = load_bin_table('Smart_Bin.csv', max_bins=max_bins)
     except FileNotFoundError:
         print("Warning: Smart_Bin.csv not found. Using synthetic data.")
-        waste_bins = generate_synthetic_waste_bins(30)
-        
-    return waste_bins
+        return generate_synthetic_waste_bins(30)
+    
+    return table.views()
 
 def generate_synthetic_waste_bins(count=30):
     """Generate synthetic waste bins if real data not available"""
-    waste_bins = []
+    ids, xs, ys, levels, capacities, bin_types, container_types = [], [], [], [], [], [], []
     for i in range(1, count+1):
-        x = random.uniform(0, 50)
-        y = random.uniform(0, 50)
+        xs.append(random.uniform(0, 50))
+        ys.append(random.uniform(0, 50))
         
-        capacity = random.choice([100, 200, 300])
-        fill_level = random.uniform(20, 95)
+        capacities.append(random.choice([100, 200, 300]))
+        levels.append(random.uniform(20, 95))
         
-        waste_bin = WasteBin(
-            bin_id=f"bin-{i}",
-            location=(x, y),
-            fill_level=fill_level,
-            capacity=capacity,
-            bin_type=random.choice(["Recyclable", "Non Recyclable", "Mixed"]),
-            container_type=random.choice(["Cubic", "Rectangular", "Silvertop-a"])
-        )
-        waste_bins.append(waste_bin)
-    return waste_bins
+        bin_types.append(random.choice(["Recyclable", "Non Recyclable", "Mixed"]))
+        container_types.append(random.choice(["Cubic", "Rectangular", "Silvertop-a"]))
+        ids.append(i)
+    
+    table = BinTable.from_columns(ids, xs, ys, levels, capacities, bin_types, container_types)
+    return table.views()
 
-def assign_bins_to_districts(districts, waste_bins):
-    """Assign waste bins to districts based on proximity"""
-    # Get district centroids for distance calculation
+def load_district_centroids(districts):
+    """Load district centroids from data/districts.csv, or draw random ones"""
     district_locations = {}
     try:
         with open('data/districts.csv', 'r') as f:
@@ -135,15 +124,35 @@ def assign_bins_to_districts(districts, waste_bins):
                 random.uniform(10, 40),
                 random.uniform(10, 40)
             )
+    return district_locations
+
+def assign_bins_to_districts(districts, waste_bins, method="auto", district_locations=None):
+    """
+    Assign waste bins to districts based on proximity.
+    method is passed to nearest_centroids: "brute" (chunked NumPy argmin),
+    "kdtree" (requires SciPy) or "auto". Centroids are loaded with
+    load_district_centroids unless district_locations is given.
+    """
+    # Get district centroids for distance calculation
+    if district_locations is None:
+        district_locations = load_district_centroids(districts)
     
-    # Assign bins to nearest district
-    for bin in waste_bins:
-        nearest_district = min(
-            districts,
-            key=lambda d: ((bin.location[0] - district_locations.get(d.district_id, (25, 25))[0])**2 + 
-                          (bin.location[1] - district_locations.get(d.district_id, (25, 25))[1])**2)
-        )
-        nearest_district.add_waste_bin(bin)
+    # Assign bins to nearest district, keeping each district's bins in input order
+    if not districts or not waste_bins:
+        return districts
+    centroids = [district_locations.get(d.district_id, (25, 25)) for d in districts]
+    table, idx = table_indices(waste_bins)
+    if table is not None:
+        points = np.column_stack((table.x[idx], table.y[idx]))
+    else:
+        points = np.array([bin.location for bin in waste_bins], dtype=np.float64)
+    nearest = nearest_centroids(points, centroids, method)
+    
+    order = np.argsort(nearest, kind="stable")
+    bounds = np.searchsorted(nearest[order], np.arange(len(districts) + 1))
+    for i, district in enumerate(districts):
+        for j in order[bounds[i]:bounds[i + 1]]:
+            district.add_waste_bin(waste_bins[j])
     
     return districts
 
@@ -159,32 +168,64 @@ def create_trucks():
     return trucks
 
 def visualize_routes(assignments, show_plot=True):
-    """Visualize truck routes on a map"""
-    plt.figure(figsize=(12, 10))
+    """
+    Visualize truck routes on a map. Every truck's routes are drawn as one
+    LineCollection and all bins as a single scatter, so large plans render in a
+    handful of draw calls; plans over ROUTE_DETAIL_MAX_STOPS stops are drawn
+    without bin id labels or antialiasing.
+    """
+    # Imported here so headless runs never pay for matplotlib
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+    from matplotlib.colors import to_rgba_array
+    from matplotlib.markers import MarkerStyle
+    
+    figure = plt.figure(figsize=(12, 10))
+    axes = plt.gca()
     colors = ['red', 'green', 'blue', 'purple', 'orange', 'teal', 'brown']
     markers = {'Recyclable': 'o', 'Non Recyclable': 's', 'Mixed': '^'}
     
-    # Plot each district's routes with a different color
-    for i, (district_id, assignment) in enumerate(assignments.items()):
-        route = assignment['route']
+    # Routes of the same truck share a color and a collection, with one line per trip
+    by_truck = {}
+    for key, assignment in assignments.items():
+        truck = assignment.get('truck')
+        trips = [trip['route'] for trip in assignment.get('trips', ())] or [assignment['route']]
+        by_truck.setdefault(truck.truck_id if truck is not None else key, []).extend(trips)
+    
+    stops = sum(len(route) for routes in by_truck.values() for route in routes)
+    detailed = stops <= ROUTE_DETAIL_MAX_STOPS
+    label_step = max(3, -(-stops // ROUTE_LABELS))
+    points, truck_colors, counts, bin_types = [], [], [], []
+    for i, routes in enumerate(by_truck.values()):
         color = colors[i % len(colors)]
+        routes = [route for route in routes if len(route)]
+        if not routes:
+            continue
+        paths = [route_locations(route) for route in routes]
+        axes.add_collection(LineCollection(paths, colors=color, linewidths=2, alpha=0.5, antialiaseds=detailed))
+        points.extend(paths)
+        truck_colors.append(color)
+        counts.append(sum(len(route) for route in routes))
+        bin_types.extend(bin.bin_type for route in routes for bin in route)
         
-        # Plot waste bins
-        for bin in route:
-            marker = markers.get(bin.bin_type, 'o')
-            plt.scatter(bin.location[0], bin.location[1], color=color, 
-                       marker=marker, s=100, alpha=0.7)
-        
-        # Plot route lines
-        for j in range(len(route) - 1):
-            plt.plot([route[j].location[0], route[j+1].location[0]],
-                     [route[j].location[1], route[j+1].location[1]],
-                     color=color, linewidth=2, alpha=0.5)
-            
-        # Mark bin IDs - only mark a subset of IDs to avoid clutter
-        for j, bin in enumerate(route):
-            if j % 3 == 0 or j == len(route)-1:  # Mark every 3rd bin and the last bin
-                plt.annotate(bin.bin_id, bin.location, fontsize=8)
+        # Mark bin IDs - only a subset (every 3rd bin, sparser on larger plans, and the last) to avoid clutter
+        if detailed:
+            for route in routes:
+                for j in sorted(set(range(0, len(route), label_step)) | {len(route) - 1}):
+                    bin = route[j]
+                    axes.annotate(bin.bin_id, bin.location, fontsize=8)
+    
+    # Plot waste bins as one scatter in their truck's color, each with its bin type's marker
+    if points:
+        points = np.concatenate(points)
+        shapes = {}
+        for bin_type in set(bin_types):
+            style = MarkerStyle(markers.get(bin_type, 'o'))
+            shapes[bin_type] = style.get_path().transformed(style.get_transform())
+        scatter = axes.scatter(points[:, 0], points[:, 1], s=100, alpha=0.7, antialiased=detailed,
+                               color=np.repeat(to_rgba_array(truck_colors), counts, axis=0))
+        scatter.set_paths([shapes[bin_type] for bin_type in bin_types])
+    axes.autoscale_view()
     
     # Add a legend for waste bin types
     for bin_type, marker in markers.items():
@@ -194,58 +235,264 @@ def visualize_routes(assignments, show_plot=True):
     plt.title("Waste Collection Routes by District")
     plt.xlabel("X Coordinate")
     plt.ylabel("Y Coordinate")
-    plt.legend()
+    # A fixed corner, as searching for the emptiest one is slow with thousands of points
+    plt.legend(loc="upper right")
     plt.grid(True)
-    plt.savefig("routes.png")
+    # Saved through the figure, as pyplot's savefig draws it a second time afterwards;
+    # light compression writes large plans several times faster for a slightly bigger file
+    figure.savefig("routes.png", pil_kwargs={"compress_level": 1})
     
     if show_plot:
         plt.show()
     else:
         plt.close()
 
-def main():
-    print("Smart Waste Management System")
-    print("-----------------------------")
+def plan_fleet(trucks, districts, balance=False, plots=True):
+    """Plan multi-trip routes for the whole fleet and print them per truck"""
+    print("\nPlanning fleet routes with savings construction and local search...")
+    optimization_start = time.time()
     
-    # Set a lower bin limit for better performance
-    max_bins = 50  # Reduced from 100 for better performance
+    with get_metrics().timer("stage", stage="routing"):
+        assignments, unserved = plan_fleet_routes(trucks, districts, balance=balance)
     
+    print(f"Fleet planning completed in {time.time() - optimization_start:.2f} seconds")
+    
+    print("\nTruck Trips:")
+    for truck_id, assignment in sorted(assignments.items()):
+        districts_served = sorted({d for trip in assignment['trips'] for d in trip['districts']})
+        print(f"Truck {truck_id}: Trips = {len(assignment['trips'])}, Bins = {len(assignment['route'])}, "
+              f"Waste = {assignment['load']:.1f}, Distance = {assignment['distance']:.1f}, "
+              f"Districts = {', '.join(str(d) for d in districts_served)}")
+    total_distance = sum(assignment['distance'] for assignment in assignments.values())
+    print(f"Total distance: {total_distance:.1f}")
+    if unserved:
+        print(f"Warning: {len(unserved)} bins are too full for any truck")
+    
+    # One plotted line per trip
+    if plots:
+        print("\nGenerating route visualizations...")
+        with get_metrics().timer("stage", stage="plots"):
+            visualize_routes(assignments, show_plot=False)
+    return assignments, unserved
+
+def bins_to_json(route):
+    """Plain JSON records for the bins of a route, in visiting order"""
+    return [
+        {"bin_id": bin.bin_id, "location": [float(bin.location[0]), float(bin.location[1])],
+         "level": float(bin.current_level), "bin_type": bin.bin_type}
+        for bin in route
+    ]
+
+def assignments_to_json(assignments, timetable=None):
+    """JSON-ready summary of assign_trucks_to_districts results and their schedule"""
+    return {
+        "districts": [
+            {
+                "district_id": district_id,
+                "truck_id": assignment['truck'].truck_id,
+                "distance": float(assignment['distance']),
+                "distance_saved": float(assignment['distance_saved']),
+                "waste": float(sum(bin.current_level for bin in assignment['route'])),
+                "route": bins_to_json(assignment['route']),
+                # The truck unloads at the depot between trips
+                "trips": [{"load": float(trip['load']), "bins": [bin.bin_id for bin in trip['route']]}
+                          for trip in assignment['trips']],
+            }
+            for district_id, assignment in assignments.items()
+        ],
+        "schedule": timetable,
+    }
+
+def fleet_to_json(assignments, unserved):
+    """JSON-ready summary of plan_fleet_routes results"""
+    return {
+        "trucks": [
+            {
+                "truck_id": truck_id,
+                "distance": float(assignment['distance']),
+                "load": float(assignment['load']),
+                "trips": [
+                    {"districts": trip['districts'], "distance": trip['distance'], "load": trip['load'],
+                     "route": bins_to_json(trip['route'])}
+                    for trip in assignment['trips']
+                ],
+            }
+            for truck_id, assignment in sorted(assignments.items())
+        ],
+        "unserved": [bin.bin_id for bin in unserved],
+    }
+
+def write_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+    print(f"Routes written to {path}")
+
+def export_plan(path, assignments):
+    with get_metrics().timer("stage", stage="export"):
+        stops = export_routes(path, assignments)
+    print(f"Exported {stops} route stops to {path}")
+
+def load_city(max_bins=None, snapshot_path=None):
+    """
+    Load the waste bins and districts, with the bins assigned to their districts.
+    A snapshot at snapshot_path is reused while it is fresh for the source files,
+    and written after loading from CSV otherwise. Returns (districts, table,
+    district_locations); table is None when there are no bins.
+    """
+    metrics = get_metrics()
     start_time = time.time()
-    print(f"\nLoading data...")
+    
+    # Reuse the snapshot when it is still fresh for the current source files
+    snapshot_params = {"max_bins": max_bins}
+    snapshot = None
+    if snapshot_path:
+        with metrics.timer("stage", stage="load"):
+            snapshot = load_snapshot(snapshot_path, SNAPSHOT_SOURCES, snapshot_params)
+    
+    if snapshot:
+        districts, table, district_locations = snapshot
+        print(f"Loaded {len(table)} waste bins from snapshot {snapshot_path} in {time.time() - start_time:.2f} seconds")
+        return districts, table, district_locations
     
     # Load real data from CSV files
-    districts = load_districts_from_csv()
-    waste_bins = load_waste_bins_from_csv(max_bins=max_bins)
+    with metrics.timer("stage", stage="load"):
+        districts = load_districts_from_csv()
+        waste_bins = load_waste_bins_from_csv(max_bins=max_bins)
     
     print(f"Loaded {len(waste_bins)} waste bins from Smart_Bin.csv in {time.time() - start_time:.2f} seconds")
     
     # Assign bins to districts
     print("\nAssigning bins to districts...")
-    districts = assign_bins_to_districts(districts, waste_bins)
+    district_locations = load_district_centroids(districts)
+    with metrics.timer("stage", stage="assign_bins"):
+        districts = assign_bins_to_districts(districts, waste_bins, district_locations=district_locations)
+    
+    if snapshot_path and waste_bins:
+        save_snapshot(snapshot_path, districts, waste_bins[0].table, district_locations,
+                      SNAPSHOT_SOURCES, snapshot_params)
+        print(f"Saved snapshot to {snapshot_path}")
+    return districts, (waste_bins[0].table if waste_bins else None), district_locations
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Smart Waste Management System")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes used to optimize districts in parallel (default: 1)")
+    parser.add_argument("--max-bins", type=int, default=0,
+                        help="number of bins to load from Smart_Bin.csv, 0 for the whole file (default: 0)")
+    parser.add_argument("--snapshot", metavar="PATH",
+                        help="binary .npz snapshot of the loaded bins and districts; reused while the "
+                             "source CSV files are unchanged, rebuilt otherwise")
+    parser.add_argument("--cluster", action="store_true",
+                        help="cover every bin that needs emptying: split large districts into truck-load "
+                             "clusters, solve each exactly and unload at the depot between them")
+    parser.add_argument("--fleet", action="store_true",
+                        help="plan the whole fleet at once: trucks make several depot trips and cross "
+                             "district borders instead of serving one district each")
+    parser.add_argument("--balance", action="store_true",
+                        help="with --fleet, size every trip for the smallest truck that can take it, so "
+                             "any of them runs it unsplit (more, shorter trips)")
+    parser.add_argument("--no-plots", action="store_true",
+                        help="skip district_map.png and routes.png, and never import matplotlib or NetworkX")
+    parser.add_argument("--json", metavar="PATH",
+                        help="write the routes (and the schedule) as JSON to PATH")
+    parser.add_argument("--export", metavar="PATH",
+                        help="write every stop of every route to PATH in one pass "
+                             "(NumPy .npz columns for a .npz file, CSV otherwise)")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="record stage timings and solver counters and write them to PATH "
+                             "(Prometheus text for a .prom file, JSON otherwise)")
+    parser.add_argument("--forecast", metavar="HOURS", type=float, nargs="?", const=DEFAULT_FORECAST_HOURS,
+                        help=f"only collect bins projected from their fill history to pass {FULL_LEVEL:.0f}%% "
+                             f"within HOURS (default: {DEFAULT_FORECAST_HOURS:g}) instead of every bin over 65%%")
+    parser.add_argument("--deadline", metavar="SECONDS", type=float,
+                        help="time budget per district; the best route found by then is used")
+    parser.add_argument("--roads", metavar="PATH",
+                        help="CSV edge list (x1,y1,x2,y2[,length]) of the road network; district routes are "
+                             "planned on shortest road distances instead of straight lines (not with --fleet)")
+    parser.add_argument("--route-cache", metavar="PATH",
+                        help="JSON file of solved district routes, reused on the next run when a district's "
+                             "bins are unchanged and used to warm-start the solver when they are close")
+    args = parser.parse_args(argv)
+    # Fleet planning measures straight lines only, so it cannot honour a road network
+    if args.fleet and args.roads:
+        parser.error("--fleet plans on straight-line distances and cannot be combined with --roads")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    metrics = enable_metrics() if args.metrics else get_metrics()
+    
+    print("Smart Waste Management System")
+    print("-----------------------------")
+    
+    # Optional bin limit for quick runs; by default the whole file is streamed
+    max_bins = args.max_bins or None
+    
+    start_time = time.time()
+    print(f"\nLoading data...")
+    
+    districts, table, district_locations = load_city(max_bins, args.snapshot)
+    
+    # Narrow the bins to collect down to those projected to fill up before collection
+    if args.forecast is not None and table is not None:
+        with metrics.timer("stage", stage="forecast"):
+            report = apply_forecast(table, args.forecast)
+        print_forecast(report)
     
     # Apply map coloring to segment districts
     print("Applying map coloring algorithm to segment districts...")
-    colored_districts = map_coloring(districts)
+    with metrics.timer("stage", stage="coloring"):
+        colored_districts = map_coloring(districts)
     
-    # Save district visualization without showing it
-    visualize_districts(colored_districts, show_plot=False)
+    # Save district visualization without showing it, laid out at the district centroids
+    if not args.no_plots:
+        with metrics.timer("stage", stage="plots"):
+            visualize_districts(colored_districts, show_plot=False, positions=district_locations)
     
     # Print district information (simplified)
     print("\nDistrict Information:")
     for district in colored_districts:
-        total_waste = sum(bin.current_level for bin in district.waste_bins)
-        emptying_needed = sum(1 for bin in district.waste_bins if bin.emptying_needed)
+        district_table, idx = table_indices(district.waste_bins)
+        if district_table is not None:
+            total_waste = district_table.levels[idx].sum()
+            emptying_needed = int(district_table.emptying_mask(idx).sum())
+        else:
+            total_waste = sum(bin.current_level for bin in district.waste_bins)
+            emptying_needed = sum(1 for bin in district.waste_bins if bin.emptying_needed)
         print(f"District {district.district_id} ({district.name}): Color = {district.color}, " 
               f"Bins = {len(district.waste_bins)}, Total Waste = {total_waste:.1f}")
     
     # Create trucks
     trucks = create_trucks()
     
+    if args.fleet:
+        fleet, unserved = plan_fleet(trucks, colored_districts, args.balance, plots=not args.no_plots)
+        if args.json:
+            write_json(args.json, fleet_to_json(fleet, unserved))
+        if args.export:
+            export_plan(args.export, fleet)
+        report_done(start_time, args)
+        return
+    
     # Optimize routes and assign trucks
-    print("\nOptimizing routes using backtracking (with time limits)...")
+    print("\nOptimizing routes using exact dynamic programming (with time limits)...")
     optimization_start = time.time()
     
-    assignments = assign_trucks_to_districts(trucks, colored_districts)
+    solver = optimize_route_clustered if args.cluster else optimize_route_dp
+    cache = None
+    if args.route_cache:
+        cache = RouteCache(path=args.route_cache)
+        print(f"Loaded {cache.load()} cached routes from {args.route_cache}")
+    network = None
+    if args.roads:
+        with metrics.timer("stage", stage="load"):
+            network = load_road_network(args.roads)
+    with metrics.timer("stage", stage="routing"):
+        assignments = assign_trucks_to_districts(trucks, colored_districts, solver=solver, workers=args.workers,
+                                                 cache=cache, network=network, deadline=args.deadline)
+    if cache is not None:
+        cache.save()
     
     print(f"Route optimization completed in {time.time() - optimization_start:.2f} seconds")
     
@@ -255,19 +502,41 @@ def main():
         district = next(d for d in districts if d.district_id == district_id)
         route = assignment['route']
         distance = assignment['distance']
+        saved = assignment['distance_saved']
         truck = assignment['truck']
         
         waste_to_collect = sum(bin.current_level for bin in route)
         print(f"District {district_id} ({district.name}) - Truck {truck.truck_id}: "
-              f"Bins = {len(route)}, Waste = {waste_to_collect:.1f}, Distance = {distance:.1f}")
+              f"Bins = {len(route)}, Waste = {waste_to_collect:.1f}, Distance = {distance:.1f} "
+              f"(local search saved {saved:.1f})")
+    
+    # Serve each color class in its own time slot, so neighbouring districts are never worked at once
+    print("\nCollection Schedule:")
+    with metrics.timer("stage", stage="schedule"):
+        timetable = schedule_collection(colored_districts, assignments)
+    print_timetable(timetable)
+    
+    if args.json:
+        write_json(args.json, assignments_to_json(assignments, timetable))
+    if args.export:
+        export_plan(args.export, assignments)
     
     # Save route visualization without showing it
-    print("\nGenerating route visualizations...")
-    visualize_routes(assignments, show_plot=False)
+    if not args.no_plots:
+        print("\nGenerating route visualizations...")
+        with metrics.timer("stage", stage="plots"):
+            visualize_routes(assignments, show_plot=False)
     
+    report_done(start_time, args)
+
+def report_done(start_time, args):
     total_time = time.time() - start_time
     print(f"\nWaste management optimization complete! Total time: {total_time:.2f} seconds")
-    print("Results saved to district_map.png and routes.png")
+    if not args.no_plots:
+        print("Results saved to district_map.png and routes.png")
+    if args.metrics:
+        get_metrics().write(args.metrics)
+        print(f"Metrics written to {args.metrics}")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -1,9 +1,12 @@
-import networkx as nx
-import matplotlib.pyplot as plt
+import heapq
+import time
 from models import District
 
 def create_district_graph(districts):
     """Create a graph representing districts and their adjacencies"""
+    # Imported here so coloring and planning runs never load NetworkX
+    import networkx as nx
+    
     G = nx.Graph()
     
     # Add nodes
@@ -17,46 +20,183 @@ def create_district_graph(districts):
     
     return G
 
-def map_coloring(districts, colors=None):
+# Graphs up to this size get the exact solver when DSATUR needs too many colors
+EXACT_MAX_DISTRICTS = 64
+
+def adjacency_lists(districts):
+    """
+    Integer adjacency: neighbors[i] holds the positions of district i's neighbors.
+    Neighbors outside `districts` are left out.
+    """
+    position = {district.district_id: i for i, district in enumerate(districts)}
+    neighbors = []
+    for i, district in enumerate(districts):
+        nodes = []
+        for neighbor in district.adjacent_districts:
+            j = position.get(neighbor.district_id)
+            if j is not None and j != i:
+                nodes.append(j)
+        neighbors.append(nodes)
+    return neighbors
+
+def dsatur_coloring(neighbors):
+    """
+    DSATUR coloring of an integer adjacency list. Returns a color index per node.
+
+    The next node is always the uncolored one with the most distinct neighbor
+    colors (its saturation), ties going to the highest degree, and it takes the
+    lowest color none of its neighbors has. Nodes wait in one heap per saturation
+    level, keyed by degree; a node whose saturation rises is pushed again one
+    bucket up and its old entry is skipped when popped. Neighbor colors are kept
+    as integer bitmasks, so the whole run is O((n + m) log n).
+    """
+    n = len(neighbors)
+    colors = [-1] * n
+    used = [0] * n
+    saturation = [0] * n
+    # Heap keys are plain ints, -degree * n + node, which order like (-degree, node)
+    key = [node - len(nodes) * n for node, nodes in enumerate(neighbors)]
+    buckets = [sorted(key)]
+    top = 0
+    push, pop = heapq.heappush, heapq.heappop
+    
+    for _ in range(n):
+        while True:
+            while not buckets[top]:
+                top -= 1
+            v = pop(buckets[top]) % n
+            # Skip entries left behind by a later push of the same node
+            if colors[v] < 0 and saturation[v] == top:
+                break
+        
+        mask = used[v]
+        color = (~mask & (mask + 1)).bit_length() - 1
+        colors[v] = color
+        bit = 1 << color
+        for u in neighbors[v]:
+            if colors[u] < 0 and not used[u] & bit:
+                used[u] |= bit
+                level = saturation[u] = saturation[u] + 1
+                if level == len(buckets):
+                    buckets.append([])
+                push(buckets[level], key[u])
+                if level > top:
+                    top = level
+    return colors
+
+def exact_coloring(neighbors, time_limit=5.0):
     """
-    Assign colors to districts such that no adjacent districts have the same color
-    using a greedy algorithm.
+    Minimum coloring by DSATUR-ordered backtracking over bitsets.
+    Returns (colors, optimal); optimal is False when time_limit ran out first,
+    in which case colors is the best coloring found so far.
+
+    The search starts from the DSATUR coloring as upper bound and a greedy clique
+    as lower bound, and stops as soon as it finds a coloring with as many colors
+    as the clique. Meant for small graphs (up to about EXACT_MAX_DISTRICTS nodes).
+    """
+    n = len(neighbors)
+    best = dsatur_coloring(neighbors)
+    if n == 0:
+        return best, True
+    best_count = max(best) + 1
+    adjacency = [sum(1 << u for u in nodes) for nodes in neighbors]
+    
+    # Greedy clique, largest degree first: no coloring can use fewer colors
+    clique = 0
+    for v in sorted(range(n), key=lambda v: len(neighbors[v]), reverse=True):
+        if adjacency[v] & clique == clique:
+            clique |= 1 << v
+    lower = bin(clique).count("1")
+    
+    colors = [-1] * n
+    classes = []  # bitmask of the nodes holding each color
+    start_time = time.time()
+    timed_out = False
+    
+    def search(colored):
+        nonlocal best, best_count, timed_out
+        if colored == n:
+            best, best_count = list(colors), len(classes)
+            return best_count <= lower
+        if time.time() - start_time > time_limit:
+            timed_out = True
+            return True
+        
+        # Most saturated uncolored node, ties to the highest degree
+        v = max((u for u in range(n) if colors[u] < 0),
+                key=lambda u: (sum(1 for c in classes if c & adjacency[u]), len(neighbors[u])))
+        for c in range(len(classes)):
+            if not classes[c] & adjacency[v]:
+                colors[v] = c
+                classes[c] |= 1 << v
+                if search(colored + 1):
+                    return True
+                classes[c] &= ~(1 << v)
+                colors[v] = -1
+        # A new color only helps while it still beats the best coloring
+        if len(classes) + 1 < best_count:
+            colors[v] = len(classes)
+            classes.append(1 << v)
+            if search(colored + 1):
+                return True
+            classes.pop()
+            colors[v] = -1
+        return False
+    
+    if lower < best_count:
+        search(0)
+    return best, not timed_out
+
+def map_coloring(districts, colors=None, exact=None):
+    """
+    Assign colors to districts such that no adjacent districts have the same color.
+
+    Districts are colored with DSATUR on their integer adjacency. exact=True always
+    runs the exact solver for the fewest colors; exact=None (the default) only
+    runs it when DSATUR needs more colors than there are and the map has at most
+    EXACT_MAX_DISTRICTS districts. Raises ValueError, leaving every district's
+    color untouched, when the colors still do not suffice.
     """
     if colors is None:
         colors = ["red", "green", "blue", "yellow"]
     
-    # Sort districts by degree (number of adjacent districts)
-    graph = create_district_graph(districts)
-    sorted_districts = sorted(
-        districts, 
-        key=lambda d: len(d.adjacent_districts), 
-        reverse=True
-    )
+    neighbors = adjacency_lists(districts)
+    coloring = dsatur_coloring(neighbors)
+    needed = max(coloring, default=-1) + 1
     
-    for district in sorted_districts:
-        # Get colors of adjacent districts
-        used_colors = {
-            adj_district.color for adj_district in district.adjacent_districts
-            if adj_district.color is not None
-        }
-        
-        # Find first available color
-        for color in colors:
-            if color not in used_colors:
-                district.color = color
-                break
+    if exact or (exact is None and needed > len(colors) and len(districts) <= EXACT_MAX_DISTRICTS):
+        coloring, optimal = exact_coloring(neighbors)
+        needed = max(coloring, default=-1) + 1
+        if needed > len(colors) and not optimal:
+            raise ValueError(f"No coloring with {len(colors)} colors found in time; "
+                             f"the best one uses {needed}")
+    
+    if needed > len(colors):
+        raise ValueError(f"District map needs {needed} colors, only {len(colors)} given")
+    
+    for district, color in zip(districts, coloring):
+        district.color = colors[color]
     
     return districts
 
-def visualize_districts(districts, show_plot=True):
-    """Visualize the district map with colors"""
+def visualize_districts(districts, show_plot=True, positions=None):
+    """
+    Visualize the district map with colors. positions maps district_id to (x, y),
+    for example the district centroids; without it a spring layout is computed.
+    """
+    import matplotlib.pyplot as plt
+    import networkx as nx
+    
     G = create_district_graph(districts)
     
-    # Get position for nodes - this is simplified and would need real coordinates in a real system
-    pos = nx.spring_layout(G)
+    # Get position for nodes - real coordinates when given, a spring layout otherwise
+    if positions is not None and all(node in positions for node in G.nodes):
+        pos = {node: positions[node] for node in G.nodes}
+    else:
+        pos = nx.spring_layout(G)
     
     # Get colors for nodes
-    colors = [districts[i-1].color for i in G.nodes]
+    colors = [G.nodes[node]['district'].color for node in G.nodes]
     
     plt.figure(figsize=(10, 8))
     nx.draw(
@@ -74,4 +214,4 @@ def visualize_districts(districts, show_plot=True):
     if show_plot:
         plt.show()
     else:
-        plt.close() 
\ No newline at end of file
+        plt.close()
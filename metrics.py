@@ -0,0 +1,170 @@
+import contextlib
+import json
+import time
+
+# Upper bounds (seconds) of the histogram buckets used when none are given
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+class Metrics:
+    """
+    Counters, stage timers and histograms for one planning run.
+
+    Every series is a name plus optional keyword labels, for example
+    increment("solver_fallbacks_total", solver="dp", reason="time_limit").
+    Timers add up the seconds spent in a `with metrics.timer(...)` block;
+    histograms count observations per bucket. Export with to_json or
+    to_prometheus.
+    """
+
+    enabled = True
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counters = {}
+        self.timers = {}
+        self.histograms = {}
+
+    def increment(self, name, value=1, **labels):
+        key = _key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+    def add_time(self, name, seconds, **labels):
+        key = _key(name, labels)
+        total, count = self.timers.get(key, (0.0, 0))
+        self.timers[key] = (total + seconds, count + 1)
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start, **labels)
+
+    def to_dict(self):
+        """Plain, JSON-ready copy of every series"""
+        def series(items, value):
+            return [{"name": name, "labels": dict(labels), **value(data)} for (name, labels), data in sorted(items)]
+
+        return {
+            "counters": series(self.counters.items(), lambda value: {"value": value}),
+            "timers": series(self.timers.items(), lambda data: {"seconds": data[0], "count": data[1]}),
+            "histograms": series(self.histograms.items(), lambda data: {
+                "buckets": dict(zip(map(str, self.buckets), data["buckets"])),
+                "sum": data["sum"],
+                "count": data["count"],
+            }),
+        }
+
+    def merge(self, data):
+        """Add in the series of another run's to_dict(), such as a worker process"""
+        for item in data["counters"]:
+            self.increment(item["name"], item["value"], **item["labels"])
+        for item in data["timers"]:
+            key = _key(item["name"], item["labels"])
+            total, count = self.timers.get(key, (0.0, 0))
+            self.timers[key] = (total + item["seconds"], count + item["count"])
+        for item in data["histograms"]:
+            key = _key(item["name"], item["labels"])
+            histogram = self.histograms.setdefault(
+                key, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.buckets):
+                histogram["buckets"][i] += item["buckets"].get(str(bound), 0)
+            histogram["sum"] += item["sum"]
+            histogram["count"] += item["count"]
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self):
+        """Prometheus text exposition format"""
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(self.counters.items()):
+            declare(name, "counter")
+            lines.append(f"{name}{_label_text(labels)} {value}")
+        for (name, labels), (total, count) in sorted(self.timers.items()):
+            declare(f"{name}_seconds", "summary")
+            lines.append(f"{name}_seconds_sum{_label_text(labels)} {total}")
+            lines.append(f"{name}_seconds_count{_label_text(labels)} {count}")
+        for (name, labels), data in sorted(self.histograms.items()):
+            declare(name, "histogram")
+            for bound, count in zip(self.buckets, data["buckets"]):
+                lines.append(f"{name}_bucket{_label_text(labels, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{_label_text(labels, [('le', '+Inf')])} {data['count']}")
+            lines.append(f"{name}_sum{_label_text(labels)} {data['sum']}")
+            lines.append(f"{name}_count{_label_text(labels)} {data['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write to path, in Prometheus text format for a .prom file and JSON otherwise"""
+        with open(path, 'w') as f:
+            f.write(self.to_prometheus() if path.endswith(".prom") else self.to_json() + "\n")
+
+
+class DisabledMetrics:
+    """Stand-in used while metrics are off: every call returns straight away"""
+
+    enabled = False
+
+    def increment(self, name, value=1, **labels):
+        pass
+
+    def observe(self, name, value, **labels):
+        pass
+
+    def add_time(self, name, seconds, **labels):
+        pass
+
+    def timer(self, name, **labels):
+        return contextlib.nullcontext()
+
+
+DISABLED = DisabledMetrics()
+_current = DISABLED
+
+
+def get_metrics():
+    """The active Metrics, or the disabled stand-in"""
+    return _current
+
+
+def enable_metrics(metrics=None):
+    """Start recording into metrics (a new Metrics by default) and return it"""
+    global _current
+    _current = metrics if metrics is not None else Metrics()
+    return _current
+
+
+def disable_metrics():
+    global _current
+    _current = DISABLED
@@ -15,16 +15,24 @@ class District:
         self.waste_bins.append(waste_bin)
 
 
+# Bins fuller than this (in percent) need emptying
+EMPTYING_THRESHOLD = 65
+
+
 class WasteBin:
     def __init__(self, bin_id, location, fill_level, capacity=100, bin_type="Mixed", container_type="Standard"):
         self.bin_id = bin_id
         self.location = location  # (x, y) coordinates
         self.capacity = capacity  # maximum capacity in kg or percentage
         self.current_level = fill_level  # current fill level (FL_B in dataset)
-        self.emptying_needed = self.current_level > 65  # Based on fill level threshold
         self.container_type = container_type  # From Container Type in dataset
         self.bin_type = bin_type  # From Recyclable fraction in dataset
     
+    @property
+    def emptying_needed(self):
+        # Based on fill level threshold, so it follows every level update
+        return self.current_level > EMPTYING_THRESHOLD
+    
     @property
     def fill_percentage(self):
         return (self.current_level / self.capacity) * 100
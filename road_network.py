@@ -0,0 +1,280 @@
+import csv
+import hashlib
+import heapq
+import time
+import numpy as np
+from distance_matrix import DistanceMatrix
+from metrics import get_metrics
+from spatial_index import nearest_centroids
+
+# Searches first stop at this many times the size of the area the bins span;
+# sources that miss a bin within that radius are searched again without a limit
+SEARCH_RADIUS_FACTOR = 3.0
+
+# Largest sources x nodes block of distances SciPy's Dijkstra returns at once
+DIJKSTRA_BLOCK = 16_000_000
+
+# Length given to edges listed with length 0, so they still count as edges
+MIN_EDGE_LENGTH = 1e-9
+
+
+def _has_scipy():
+    try:
+        import scipy.sparse.csgraph  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class RoadNetwork:
+    """
+    Undirected road graph for distances along streets instead of straight lines.
+    distance_matrix builds the RoadDistanceMatrix the solvers read from.
+
+    Nodes are points (x, y) and edges carry a length. Parallel edges keep the
+    shortest one. Only the largest connected component is used, so every pair of
+    snapped points has a finite distance. Adjacency is held in CSR arrays
+    (indptr, indices, lengths), which SciPy's Dijkstra reads directly; without
+    SciPy a heap-based Dijkstra runs over the same arrays.
+    """
+
+    def __init__(self, nodes, sources, targets, lengths):
+        nodes = np.asarray(nodes, dtype=np.float64).reshape(-1, 2)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        lengths = np.maximum(np.asarray(lengths, dtype=np.float64), MIN_EDGE_LENGTH)
+        self.edge_count = len(sources)
+
+        # Both directions of every edge, the shortest of any parallel edges, no loops
+        keep = sources != targets
+        tails = np.concatenate((sources[keep], targets[keep]))
+        heads = np.concatenate((targets[keep], sources[keep]))
+        weights = np.concatenate((lengths[keep], lengths[keep]))
+        order = np.lexsort((weights, heads, tails))
+        tails, heads, weights = tails[order], heads[order], weights[order]
+        first = np.ones(len(tails), dtype=bool)
+        first[1:] = (tails[1:] != tails[:-1]) | (heads[1:] != heads[:-1])
+        tails, heads, weights = tails[first], heads[first], weights[first]
+
+        component = self._largest_component(len(nodes), tails, heads)
+        # Renumber the nodes of the largest component 0..V-1
+        renumber = np.full(len(nodes), -1, dtype=np.int64)
+        renumber[component] = np.arange(len(component))
+        inside = (renumber[tails] >= 0) & (renumber[heads] >= 0)
+        tails, heads, weights = renumber[tails[inside]], renumber[heads[inside]], weights[inside]
+
+        self.nodes = nodes[component]
+        self.indptr = np.concatenate(([0], np.cumsum(np.bincount(tails, minlength=len(self.nodes)))))
+        self.indices = heads
+        self.lengths = weights
+        self._graph = None
+
+    @classmethod
+    def from_edge_list(cls, path):
+        """
+        Load a CSV edge list with columns x1, y1, x2, y2 and an optional length.
+        Endpoints with the same coordinates are the same node; a missing or empty
+        length is the straight-line length of the edge.
+        """
+        with open(path, 'r', newline='') as f:
+            reader = csv.reader(f)
+            header = [name.strip() for name in next(reader)]
+            column = {name: header.index(name) for name in header}
+            rows = list(reader)
+
+        def floats(name):
+            return np.fromiter((float(row[column[name]]) for row in rows), dtype=np.float64, count=len(rows))
+
+        x1, y1, x2, y2 = (floats(name) for name in ("x1", "y1", "x2", "y2"))
+        straight = np.hypot(x2 - x1, y2 - y1)
+        if "length" in column:
+            lengths = np.fromiter((float(row[column["length"]]) if row[column["length"]] else np.nan
+                                   for row in rows), dtype=np.float64, count=len(rows))
+            lengths = np.where(np.isnan(lengths), straight, lengths)
+        else:
+            lengths = straight
+
+        ends = np.concatenate((np.column_stack((x1, y1)), np.column_stack((x2, y2))))
+        nodes, inverse = np.unique(ends, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        return cls(nodes, inverse[:len(rows)], inverse[len(rows):], lengths)
+
+    @staticmethod
+    def _largest_component(count, tails, heads):
+        if _has_scipy():
+            from scipy.sparse import csr_matrix
+            from scipy.sparse.csgraph import connected_components
+            graph = csr_matrix((np.ones(len(tails)), (tails, heads)), shape=(count, count))
+            _, labels = connected_components(graph, directed=False)
+        else:
+            # Union-find with path halving
+            parent = list(range(count))
+
+            def find(a):
+                while parent[a] != a:
+                    parent[a] = parent[parent[a]]
+                    a = parent[a]
+                return a
+
+            for a, b in zip(tails.tolist(), heads.tolist()):
+                ra, rb = find(a), find(b)
+                if ra != rb:
+                    parent[ra] = rb
+            labels = np.array([find(a) for a in range(count)], dtype=np.int64)
+        # Isolated nodes are never part of the result, whatever their label
+        used = np.zeros(count, dtype=bool)
+        used[tails] = True
+        if not used.any():
+            return np.arange(min(count, 1))
+        largest = np.bincount(labels[used]).argmax()
+        return np.flatnonzero(used & (labels == largest))
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def checksum(self):
+        """SHA-256 of the graph, to tell routes planned on different road data apart"""
+        digest = hashlib.sha256()
+        for array in (self.nodes, self.indptr, self.indices, self.lengths):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    def snap(self, points):
+        """Nearest road node of every point, through the spatial index, and how far off it is"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        nearest = nearest_centroids(points, self.nodes)
+        offsets = np.hypot(*(points - self.nodes[nearest]).T)
+        return nearest, offsets
+
+    def shortest_paths(self, sources, targets, limit=np.inf):
+        """
+        Road distances from every source node to every target node, as a float32
+        (sources x targets) array. Paths longer than limit may come back as inf.
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        result = np.empty((len(sources), len(targets)), dtype=np.float32)
+        if _has_scipy():
+            from scipy.sparse import csr_matrix
+            from scipy.sparse.csgraph import dijkstra
+            if self._graph is None:
+                self._graph = csr_matrix((self.lengths, self.indices, self.indptr), shape=(len(self), len(self)))
+            rows = max(DIJKSTRA_BLOCK // max(len(self), 1), 1)
+            for start in range(0, len(sources), rows):
+                block = dijkstra(self._graph, indices=sources[start:start + rows], limit=limit)
+                result[start:start + rows] = block[:, targets]
+            return result
+
+        adjacency = (self.indptr.tolist(), self.indices.tolist(), self.lengths.tolist())
+        for k, source in enumerate(sources.tolist()):
+            result[k] = self._dijkstra(adjacency, source, targets, limit)
+        return result
+
+    @staticmethod
+    def _dijkstra(adjacency, source, targets, limit):
+        # Heap-based Dijkstra that stops once every target is settled
+        indptr, indices, lengths = adjacency
+        wanted = set(targets.tolist())
+        best = {source: 0.0}
+        settled = {}
+        heap = [(0.0, source)]
+        while heap and wanted:
+            d, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled[node] = d
+            wanted.discard(node)
+            for e in range(indptr[node], indptr[node + 1]):
+                nd = d + lengths[e]
+                head = indices[e]
+                if nd <= limit and nd < best.get(head, np.inf):
+                    best[head] = nd
+                    heapq.heappush(heap, (nd, head))
+        return [settled.get(target, np.inf) for target in targets.tolist()]
+
+    def distance_matrix(self, waste_bins, depot=(0, 0)):
+        """RoadDistanceMatrix over the bins and the depot"""
+        return RoadDistanceMatrix(self, waste_bins, depot)
+
+    def __getstate__(self):
+        # The SciPy graph is rebuilt on first use, so it need not travel to workers
+        state = self.__dict__.copy()
+        state["_graph"] = None
+        return state
+
+
+class RoadDistanceMatrix(DistanceMatrix):
+    """
+    DistanceMatrix of road distances, filled in a row at a time as solvers ask.
+
+    The depot and every bin are snapped to their nearest road node when the matrix
+    is built, and the distance between two points is the offset of each from its
+    node plus the shortest path between the nodes. A row is computed by Dijkstra
+    the first time a lookup touches it, all missing rows of a lookup in one batch,
+    and fills its column too since roads are undirected. Searches are first
+    bounded to SEARCH_RADIUS_FACTOR times the span of the points; any source that
+    misses a point within that radius is searched again without a limit. Solvers
+    that route the fullest few bins of a district never pay for the others.
+    """
+
+    euclidean = False
+
+    def __init__(self, network, waste_bins, depot=(0, 0)):
+        self.network = network
+        super().__init__(waste_bins, depot)
+
+    def _distances(self, points):
+        self.nodes, self.offsets = self.network.snap(points)
+        span = float(np.hypot(*(points.max(axis=0) - points.min(axis=0))))
+        self.limit = SEARCH_RADIUS_FACTOR * span + 2 * float(self.offsets.max(initial=0.0))
+        self.known = np.zeros(len(points), dtype=bool)
+        return np.full((len(points), len(points)), np.nan, dtype=np.float32)
+
+    def _fill(self, idx):
+        """Compute the rows at matrix indices idx that are not known yet"""
+        idx = np.unique(np.asarray(idx, dtype=np.intp))
+        missing = idx[~self.known[idx]]
+        if len(missing) == 0:
+            return
+        sources, inverse = np.unique(self.nodes[missing], return_inverse=True)
+        roads = self.network.shortest_paths(sources, self.nodes, self.limit)
+        missed = np.flatnonzero(np.isinf(roads).any(axis=1))
+        if len(missed):
+            roads[missed] = self.network.shortest_paths(sources[missed], self.nodes)
+
+        rows = roads[inverse.reshape(-1)]
+        rows += self.offsets[missing, None].astype(np.float32)
+        rows += self.offsets[None, :].astype(np.float32)
+        rows[np.arange(len(missing)), missing] = 0
+        self.matrix[missing] = rows
+        self.matrix[:, missing] = rows.T
+        self.known[missing] = True
+        get_metrics().increment("distance_evaluations_total", rows.size)
+
+    def distance(self, bin1, bin2):
+        self._fill([self.index[bin1.bin_id]])
+        return super().distance(bin1, bin2)
+
+    def depot_distance(self, waste_bin):
+        self._fill([0])
+        return super().depot_distance(waste_bin)
+
+    def submatrix(self, waste_bins, start_point=None):
+        # The start row comes in the same batch as the bins' rows
+        self._fill(np.concatenate(([0], self.indices(waste_bins))))
+        return super().submatrix(waste_bins, start_point)
+
+    def route_distance(self, route, start_point=None):
+        self._fill(self.indices(route))
+        return super().route_distance(route, start_point)
+
+
+def load_road_network(path, report=True):
+    """Load a road network from an edge list, printing its size when report is set"""
+    start_time = time.time()
+    network = RoadNetwork.from_edge_list(path)
+    if report:
+        print(f"Loaded road network from {path}: {len(network)} nodes, {network.edge_count} edges "
+              f"in {time.time() - start_time:.2f} seconds")
+    return network
@@ -0,0 +1,156 @@
+import functools
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from metrics import get_metrics
+
+ROUTE_CACHE_VERSION = 1
+
+# Smallest share of bins two bin sets must have in common for a near hit
+NEAR_HIT_OVERLAP = 0.8
+
+
+def _plain(value):
+    # NumPy scalars to Python ones, so keys and files do not depend on the dtype
+    return value.item() if hasattr(value, "item") else value
+
+
+def solver_name(solver):
+    """Stable name of a solver, including the keywords bound with functools.partial"""
+    if isinstance(solver, str):
+        return solver
+    if isinstance(solver, functools.partial):
+        keywords = ",".join(f"{key}={value!r}" for key, value in sorted(solver.keywords.items()))
+        return f"{solver_name(solver.func)}({keywords})"
+    return getattr(solver, "__qualname__", repr(solver))
+
+
+def _group_key(truck, start_point, solver):
+    return json.dumps([_plain(truck.truck_id), _plain(truck.capacity), truck.bin_type_specialty,
+                       list(start_point) if start_point is not None else None, solver_name(solver)])
+
+
+def fingerprint(truck, waste_bins, start_point=None, solver=None):
+    """
+    SHA-256 over everything a route depends on: every bin's id, position, level,
+    type and whether it needs emptying (which a forecast can change), the truck's
+    capacity and specialty, the start point and the solver (or a name for the solver
+    and its distances, see solver_name).
+    """
+    digest = hashlib.sha256(_group_key(truck, start_point, solver).encode())
+    for bin in waste_bins:
+        digest.update(repr((_plain(bin.bin_id), tuple(map(float, bin.location)), float(bin.current_level),
+                            bin.bin_type, bin.emptying_needed)).encode())
+    return digest.hexdigest()
+
+
+class RouteCache:
+    """
+    LRU cache of solved district routes.
+
+    Entries are keyed by fingerprint, hold at most max_entries routes and expire
+    ttl seconds after they were stored (None keeps them until evicted). Routes are
+    stored as bin ids, so a hit is mapped back onto the caller's bin objects. With
+    a path the cache can be saved to and loaded from a JSON file between runs.
+    """
+
+    def __init__(self, max_entries=1024, ttl=24 * 3600.0, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _expired(self, entry, now):
+        return self.ttl is not None and now - entry["stored"] > self.ttl
+
+    def _route(self, entry, waste_bins):
+        by_id = {_plain(bin.bin_id): bin for bin in waste_bins}
+        return [by_id[bin_id] for bin_id in entry["route"] if bin_id in by_id]
+
+    def lookup(self, truck, waste_bins, start_point=None, solver=None):
+        """
+        Returns (hit, warm_start). hit is the stored (route, distance, distance_saved,
+        trip_sizes) when the bins, truck, start point and solver are exactly the ones stored.
+        Otherwise warm_start is the route of the stored entry for the same truck,
+        start point and solver whose bins overlap the most (at least
+        NEAR_HIT_OVERLAP), restricted to bins still present, or None.
+        """
+        metrics = get_metrics()
+        now = time.time()
+        key = fingerprint(truck, waste_bins, start_point, solver)
+        entry = self.entries.get(key)
+        if entry is not None and not self._expired(entry, now):
+            self.entries.move_to_end(key)
+            metrics.increment("route_cache_hits_total", kind="exact")
+            return (self._route(entry, waste_bins), entry["distance"], entry["saved"], entry.get("trips")), None
+
+        group = _group_key(truck, start_point, solver)
+        bin_ids = {_plain(bin.bin_id) for bin in waste_bins}
+        best, best_overlap = None, NEAR_HIT_OVERLAP
+        for entry in self.entries.values():
+            if entry["group"] != group or self._expired(entry, now):
+                continue
+            overlap = len(bin_ids.intersection(entry["bins"])) / max(len(bin_ids | set(entry["bins"])), 1)
+            if overlap >= best_overlap:
+                best, best_overlap = entry, overlap
+        if best is not None:
+            metrics.increment("route_cache_hits_total", kind="near")
+            return None, self._route(best, waste_bins)
+        metrics.increment("route_cache_misses_total")
+        return None, None
+
+    def store(self, truck, waste_bins, start_point, solver, route, distance, saved=0.0, trip_sizes=None):
+        """
+        Remember a solved route and the sizes of its trips (None for one trip),
+        evicting expired and then least recently used entries
+        """
+        key = fingerprint(truck, waste_bins, start_point, solver)
+        self.entries[key] = {
+            "group": _group_key(truck, start_point, solver),
+            "bins": [_plain(bin.bin_id) for bin in waste_bins],
+            "route": [_plain(bin.bin_id) for bin in route],
+            "distance": float(distance),
+            "saved": float(saved),
+            "trips": trip_sizes,
+            "stored": time.time(),
+        }
+        self.entries.move_to_end(key)
+        self.prune()
+
+    def prune(self):
+        """Drop expired entries, then the least recently used ones beyond max_entries"""
+        now = time.time()
+        for key in [key for key, entry in self.entries.items() if self._expired(entry, now)]:
+            del self.entries[key]
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def save(self, path=None):
+        """Write the live entries, least recently used first, to a JSON file"""
+        self.prune()
+        with open(path or self.path, 'w') as f:
+            json.dump({"version": ROUTE_CACHE_VERSION, "entries": list(self.entries.items())}, f)
+
+    def load(self, path=None):
+        """
+        Read entries saved by save, keeping their order and dropping expired ones.
+        Returns the number of entries loaded; a missing file or another format
+        version loads nothing.
+        """
+        path = path or self.path
+        if not os.path.exists(path):
+            return 0
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") != ROUTE_CACHE_VERSION:
+            return 0
+        for key, entry in data["entries"]:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+        self.prune()
+        return len(self.entries)
@@ -0,0 +1,80 @@
+import csv
+import numpy as np
+from bin_table import BIN_ID_PREFIX, BinTable, Route, table_indices
+
+# Columns of an exported plan, one row per stop, and their dtypes. "assignment" is
+# the key of the assignment: the district id, or the truck id for fleet plans.
+# "trip" numbers the truckloads of a route from 1; the truck unloads between them.
+ROUTE_COLUMNS = {
+    "assignment": np.int32,
+    "truck_id": np.int32,
+    "trip": np.int32,
+    "stop": np.int32,
+    "bin_id": np.int32,
+    "x": np.float64,
+    "y": np.float64,
+    "level": np.float32,
+    "bin_type": str,
+}
+
+
+def _table_rows(route):
+    # Table and row indices of a route, building a table for plain WasteBin lists
+    if isinstance(route, Route):
+        return route.table, route.indices
+    table, idx = table_indices(route)
+    if table is None:
+        table, idx = BinTable.from_bins(route), np.arange(len(route))
+    return table, idx
+
+
+def route_columns(assignments):
+    """
+    Every route of a plan as one set of ROUTE_COLUMNS arrays, in assignment and
+    then visiting order (stops are numbered from 1 along each route). Routes are
+    taken trip by trip from the assignment's "trips" when it has them. Columns
+    are gathered from the bin table with one fancy index per trip.
+    """
+    parts = {name: [] for name in ROUTE_COLUMNS}
+    for key, assignment in assignments.items():
+        trips = [trip["route"] for trip in assignment.get("trips", ())] or [assignment["route"]]
+        stop = 1
+        for number, trip in enumerate(trips, 1):
+            if not len(trip):
+                continue
+            table, idx = _table_rows(trip)
+            parts["assignment"].append(np.full(len(idx), key, dtype=np.int32))
+            parts["truck_id"].append(np.full(len(idx), assignment["truck"].truck_id, dtype=np.int32))
+            parts["trip"].append(np.full(len(idx), number, dtype=np.int32))
+            parts["stop"].append(np.arange(stop, stop + len(idx), dtype=np.int32))
+            stop += len(idx)
+            parts["bin_id"].append(table.ids[idx])
+            parts["x"].append(table.x[idx])
+            parts["y"].append(table.y[idx])
+            parts["level"].append(table.levels[idx])
+            parts["bin_type"].append(np.asarray(table.bin_type_names)[table.bin_type_codes[idx]])
+    return {name: np.concatenate(parts[name]).astype(dtype, copy=False) if parts[name] else np.empty(0, dtype)
+            for name, dtype in ROUTE_COLUMNS.items()}
+
+
+def export_routes(path, assignments):
+    """
+    Write every route of a plan in one pass, one row per stop: a NumPy .npz
+    archive of the columns for paths ending in .npz, CSV otherwise (bin ids as
+    "bin-<number>"). Returns the number of stops written.
+    """
+    columns = route_columns(assignments)
+    if str(path).endswith(".npz"):
+        np.savez(path, **columns)
+    else:
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(ROUTE_COLUMNS)
+            writer.writerows(zip(
+                columns["assignment"].tolist(), columns["truck_id"].tolist(), columns["trip"].tolist(),
+                columns["stop"].tolist(),
+                np.char.add(BIN_ID_PREFIX, columns["bin_id"].astype(str)).tolist(),
+                columns["x"].tolist(), columns["y"].tolist(),
+                np.round(columns["level"].astype(np.float64), 2).tolist(), columns["bin_type"].tolist(),
+            ))
+    return len(columns["stop"])
@@ -1,6 +1,45 @@
+import inspect
 import math
 import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 from models import Truck, WasteBin
+from bin_table import as_route, emptying_thresholds, emptying_waste_by_type
+from distance_matrix import DistanceMatrix, route_distance_matrix
+from spatial_index import GridIndex
+from local_search import improve_route
+from metrics import Metrics, enable_metrics, get_metrics
+from route_cache import solver_name
+
+# Upper bound on (subsets x end bins) held by one layer of the DP before it gives up
+MAX_DP_STATES = 20_000_000
+
+# Most bins the DP routes by default: with the hand-off below, the two exact solvers
+# prove the optimum for this many within their default 5 second limit, while at 25
+# bins routes that leave out a few of them can still run out of time
+DP_MAX_BINS = 22
+
+# Past this many bins each exact solver hands over the routes it is slow on (see
+# _fill_slack): routes that visit all or nearly all bins go to branch and bound,
+# whose spanning tree bound proves them fast, and routes that pick fewer bins to
+# fill the truck go to the DP, which keeps one path per set of bins where the
+# search would try each order
+EXACT_HANDOFF_BINS = 16
+
+# Most bins a route may leave out for branch and bound to take it over the DP
+EXACT_HANDOFF_SLACK = 1
+
+# Partial routes of each DP layer finished greedily to tighten its upper bound early
+DP_DIVES = 32
+
+# Greedy switches to the grid index from this many bins when no backend is chosen
+SPATIAL_INDEX_MIN_BINS = 2000
+
+# Nodes the backtracking search expands between two looks at the clock
+CLOCK_CHECK_NODES = 1024
+
+# Most (visited bins, position) states branch and bound remembers for dominance pruning
+MAX_DOMINANCE_STATES = 2_000_000
 
 def distance(bin1, bin2):
     """Calculate Euclidean distance between two waste bins"""
@@ -8,6 +47,10 @@ def distance(bin1, bin2):
     x2, y2 = bin2.location
     return math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
 
+def distance_to_point(waste_bin, point):
+    """Euclidean distance from a waste bin to a point"""
+    return math.hypot(waste_bin.location[0] - point[0], waste_bin.location[1] - point[1])
+
 def total_route_distance(route):
     """Calculate the total distance of a route"""
     total = 0
@@ -15,21 +58,17 @@ def total_route_distance(route):
         total += distance(route[i], route[i + 1])
     return total
 
-def optimize_route_backtracking(truck, waste_bins, start_point=None, max_bins=15, time_limit=5.0):
+def _greedy_fallback(truck, waste_bins, start_point, dist_matrix, solver, reason):
+    """Fall back to the greedy route, recording which solver gave up and why"""
+    print(f"Fallback to greedy algorithm for truck {truck.truck_id}")
+    get_metrics().increment("solver_fallbacks_total", solver=solver, reason=reason)
+    return greedy_route_optimization(truck, waste_bins, start_point, dist_matrix)
+
+def select_priority_bins(truck, waste_bins, max_bins):
     """
-    Use backtracking with optimizations to find optimal route for a truck to collect waste.
-    Returns the optimized route and its distance.
-    
-    Args:
-        truck: The truck object
-        waste_bins: List of waste bins that need collection
-        start_point: Starting location coordinates (x,y)
-        max_bins: Maximum number of bins to consider for optimization (limits complexity)
-        time_limit: Maximum time in seconds to spend on optimization
+    Pick the bins a truck should consider: bins that need emptying (restricted to
+    the truck's specialty when possible), fullest first, capped at max_bins.
     """
-    if not waste_bins:
-        return [], 0
-    
     # Filter bins that need emptying and those matching truck specialty
     priority_bins = [bin for bin in waste_bins if bin.emptying_needed]
     
@@ -48,170 +87,1114 @@ def optimize_route_backtracking(truck, waste_bins, start_point=None, max_bins=15
     priority_bins = sorted(priority_bins, key=lambda x: x.current_level, reverse=True)
     
     # Limit the number of bins to process to avoid exponential complexity
-    priority_bins = priority_bins[:max_bins]
+    return priority_bins[:max_bins]
+
+def _fill_slack(truck, levels):
+    """
+    How many bins a complete route can leave out, given the levels of the bins the
+    truck can take: those left once the fullest bins reach 90% of its capacity,
+    none when they never do and the route has to visit them all
+    """
+    threshold = truck.capacity * 0.9
+    gathered = 0.0
+    for count, level in enumerate(sorted(levels, reverse=True), 1):
+        gathered += level
+        if gathered >= threshold:
+            return len(levels) - count
+    return 0
+
+def _warm_start(truck, candidates, initial_route, dist, threshold):
+    """
+    Check a route to start a search from, such as a cached tour, against the
+    current candidates: dist has the start point at index 0 and candidates[i] at
+    i + 1. The route's bins that are still candidates are kept in order; they must
+    fit in the truck and either include every candidate or reach the threshold.
+    Returns (route, distance), or (None, inf) when the route does not qualify.
+    """
+    position = {id(bin): i for i, bin in enumerate(candidates)}
+    order = [position[id(bin)] for bin in initial_route or () if id(bin) in position]
+    load = sum(candidates[i].current_level for i in order)
+    if (not order or load > truck.capacity
+            or any(truck.bin_type_specialty and candidates[i].bin_type not in (truck.bin_type_specialty, "Mixed")
+                   for i in order)
+            or (len(order) < len(candidates) and load < threshold)):
+        return None, float('inf')
+    distance = float(dist[0, order[0] + 1] + sum(dist[a + 1, b + 1] for a, b in zip(order, order[1:])))
+    return [candidates[i] for i in order], distance
+
+def optimize_route_backtracking(truck, waste_bins, start_point=None, max_bins=15, time_limit=5.0, dist_matrix=None,
+                                branch_and_bound=True, initial_route=None, on_improve=None):
+    """
+    Use backtracking with optimizations to find optimal route for a truck to collect waste.
+    Returns the optimized route and its distance.
+    
+    With branch_and_bound the search starts from the greedy route as its best
+    distance and cuts every partial route whose distance plus a lower bound on the
+    rest cannot beat the best one. The bound takes the fewest further bins that
+    could finish the route, charging the first its distance from the current
+    position and the others their cheapest incoming edge; when every remaining bin
+    has to be visited, a minimum spanning tree over them is used if it is larger.
+    Neither overestimates, so the route found is still optimal. A partial route
+    is also cut when one over the same bins, ending at the same bin, was at
+    least as short (up to MAX_DOMINANCE_STATES remembered states). An
+    initial_route, such as a cached tour, replaces the greedy route as the first
+    best route when it is complete and shorter.
+    
+    The search is anytime: on_improve(route, distance, elapsed) is called with
+    every complete route better than the last one reported, starting with the
+    greedy (or initial) route right away, so a caller can use the best route so
+    far at any time. When time_limit runs out the best route found is returned.
+    
+    Args:
+        truck: The truck object
+        waste_bins: List of waste bins that need collection
+        start_point: Starting location coordinates (x,y)
+        max_bins: Maximum number of bins to consider for optimization (limits complexity)
+        time_limit: Maximum time in seconds to spend on optimization
+        dist_matrix: Shared DistanceMatrix to read distances from
+        branch_and_bound: Prune partial routes on distance (False searches exhaustively)
+        initial_route: Route to warm-start the search from (used with branch_and_bound)
+        on_improve: Called as on_improve(route, distance, elapsed) with each better route
+    """
+    if not waste_bins:
+        return [], 0
+    
+    priority_bins = select_priority_bins(truck, waste_bins, max_bins)
+    dist = route_distance_matrix(priority_bins, start_point, dist_matrix)
+    n = len(priority_bins)
+    # Row/column 0 is the start point and bin i is at i + 1, as plain lists for the hot loop
+    D = dist.tolist()
+    levels = [bin.current_level for bin in priority_bins]
+    eligible = [not truck.bin_type_specialty
+                or bin.bin_type == truck.bin_type_specialty
+                or bin.bin_type == "Mixed"
+                for bin in priority_bins]
+    threshold = truck.capacity * 0.9
+    
+    # Large routes that pick some of the bins to fill the truck are the DP's to prove
+    takeable = [level for level, ok in zip(levels, eligible) if ok and level <= truck.capacity]
+    if branch_and_bound and n > EXACT_HANDOFF_BINS and _fill_slack(truck, takeable) > EXACT_HANDOFF_SLACK:
+        return optimize_route_dp(truck, priority_bins, start_point, max_bins=n, time_limit=time_limit,
+                                 dist_matrix=dist_matrix, initial_route=initial_route, on_improve=on_improve)
     
     best_route = []
     best_distance = float('inf')
-    visited = [False] * len(priority_bins)
+    visited = [False] * n
+    visited_count = 0
+    visited_mask = 0
     current_route = []
     current_load = 0
     start_time = time.time()
+    # Plain counters in the hot loop; they go to the metrics once at the end
+    nodes = prunes = 0
+    timed_out = False
+    
+    def improve(route, distance):
+        # Keep a better complete route and report it
+        nonlocal best_route, best_distance
+        best_route, best_distance = route, distance
+        if on_improve is not None:
+            on_improve(route, distance, time.time() - start_time)
+    
+    if branch_and_bound or on_improve is not None:
+        # The greedy route is the first upper bound when it is a complete route
+        greedy_route, greedy_distance = greedy_route_optimization(truck, priority_bins, start_point, dist_matrix)
+        warm_route, warm_distance = _warm_start(truck, priority_bins, initial_route, dist, threshold)
+        if len(greedy_route) == n or sum(bin.current_level for bin in greedy_route) >= threshold:
+            if greedy_distance <= warm_distance:
+                improve(greedy_route, greedy_distance)
+        if warm_distance < best_distance:
+            improve(warm_route, warm_distance)
+    
+    if branch_and_bound:
+        # Cheapest edge into each bin from another bin, and bins ordered for the bound
+        incoming = [min((D[i + 1][j + 1] for i in range(n) if i != j), default=0.0) for j in range(n)]
+        by_incoming = sorted(range(n), key=lambda j: incoming[j])
+        by_level = sorted(range(n), key=lambda j: levels[j], reverse=True)
+        # A bin the truck can never take means the route can only end by filling up
+        unvisitable = any(not eligible[j] or levels[j] > truck.capacity for j in range(n))
+        mst_cache = {}
+        shortest = {}
+        # Each pair's cheaper direction, so the tree bounds a path whichever way it runs
+        undirected = np.minimum(dist, dist.T).tolist()
+    
+    def spanning_tree(mask):
+        # Prim's algorithm over the bins in mask, cached per set of bins: the running
+        # totals of its edges, cheapest first
+        if mask not in mst_cache:
+            members = [j for j in range(n) if mask >> j & 1]
+            best = {j: undirected[members[0] + 1][j + 1] for j in members[1:]}
+            edges = []
+            while best:
+                j = min(best, key=best.get)
+                edges.append(best.pop(j))
+                row = undirected[j + 1]
+                for k in best:
+                    if row[k + 1] < best[k]:
+                        best[k] = row[k + 1]
+            edges.sort()
+            totals = [0.0]
+            for edge in edges:
+                totals.append(totals[-1] + edge)
+            mst_cache[mask] = totals
+        return mst_cache[mask]
+    
+    def lower_bound(position):
+        # Fewest further bins that could bring the load up to the threshold, fullest first
+        gathered, more = current_load, 0
+        for j in by_level:
+            if gathered >= threshold:
+                break
+            if not visited[j] and eligible[j] and current_load + levels[j] <= truck.capacity:
+                gathered += levels[j]
+                more += 1
+        visit_all = gathered < threshold
+        if visit_all and (unvisitable or more < n - visited_count):
+            # The route can neither fill up nor visit every bin any more
+            return float('inf')
+        if more == 0:
+            return 0.0
+        
+        usable = [j for j in range(n)
+                  if not visited[j] and eligible[j] and current_load + levels[j] <= truck.capacity]
+        first = min(D[position][j + 1] for j in usable)
+        rest, counted = 0.0, 0
+        for j in by_incoming:
+            if counted == more - 1:
+                break
+            if not visited[j] and eligible[j] and current_load + levels[j] <= truck.capacity:
+                rest += incoming[j]
+                counted += 1
+        if more > 2:
+            # The rest of the route is a path over more of the usable bins, so it is no
+            # shorter than the cheapest more - 1 edges of their spanning tree
+            rest = max(rest, spanning_tree(sum(1 << j for j in usable))[more - 1])
+        return first + rest
     
     def backtrack(position, current_distance):
-        nonlocal best_route, best_distance, current_route, current_load
+        nonlocal current_load, nodes, prunes, timed_out
+        nonlocal visited_count, visited_mask
         
-        # Check if time limit is reached
-        if time.time() - start_time > time_limit:
+        # Check the clock every CLOCK_CHECK_NODES nodes rather than at every node
+        nodes += 1
+        if nodes % CLOCK_CHECK_NODES == 0 and time.time() - start_time > time_limit:
+            timed_out = True
+        if timed_out:
             return
         
         # If all bins that can fit are visited or truck is full
-        if all(visited) or current_load >= truck.capacity * 0.9:
+        if visited_count == n or current_load >= threshold:
             # Complete path found, check if it's better
             if current_distance < best_distance:
-                best_distance = current_distance
-                best_route = current_route.copy()
+                improve(current_route.copy(), current_distance)
             return
         
+        if branch_and_bound:
+            # Cut partial routes dominated by an earlier one over the same bins and end
+            state = (visited_mask, position)
+            known = shortest.get(state)
+            if known is not None and known <= current_distance:
+                prunes += 1
+                return
+            if known is not None or len(shortest) < MAX_DOMINANCE_STATES:
+                shortest[state] = current_distance
+            
+            # Cut partial routes that cannot beat the best complete route
+            if current_distance + lower_bound(position) >= best_distance:
+                prunes += 1
+                return
+        
         # Sort remaining bins by distance to current position for better pruning
         remaining_indices = []
-        for i in range(len(priority_bins)):
-            if not visited[i] and current_load + priority_bins[i].current_level <= truck.capacity:
-                if not truck.bin_type_specialty or priority_bins[i].bin_type == truck.bin_type_specialty or priority_bins[i].bin_type == "Mixed":
-                    dist_to_bin = 0
-                    if position is not None:
-                        if current_route:
-                            dist_to_bin = distance(current_route[-1], priority_bins[i])
-                        else:
-                            # Distance from start point to first bin
-                            x, y = position
-                            start_bin = WasteBin(bin_id="-1", location=position, fill_level=0)  # Dummy bin for calculation
-                            dist_to_bin = distance(start_bin, priority_bins[i])
-                    remaining_indices.append((i, dist_to_bin))
+        for i in range(n):
+            if visited[i] or not eligible[i]:
+                continue
+            if current_load + levels[i] <= truck.capacity:
+                # Row `position` is the start point (0) or the last bin visited (i + 1)
+                remaining_indices.append((i, D[position][i + 1]))
+            else:
+                # Branch cut: the bin no longer fits in the truck
+                prunes += 1
         
         # Sort by distance (nearest first) for better pruning
         remaining_indices.sort(key=lambda x: x[1])
         
         for i, dist_to_bin in remaining_indices:
-            # Skip if truck specializes in a waste type and this bin doesn't match (unless mixed)
-            if (truck.bin_type_specialty and 
-                priority_bins[i].bin_type != truck.bin_type_specialty and 
-                priority_bins[i].bin_type != "Mixed"):
-                continue
-                
+            # Bins are nearest first, so once one leg is too long every later one is too
+            if branch_and_bound and current_distance + dist_to_bin >= best_distance:
+                prunes += 1
+                break
+            
             # Try this bin
             visited[i] = True
+            visited_count += 1
+            visited_mask |= 1 << i
             current_route.append(priority_bins[i])
-            current_load += priority_bins[i].current_level
+            current_load += levels[i]
             
             # Recursive call
-            backtrack(priority_bins[i].location, current_distance + dist_to_bin)
-            
-            # If we've found a good enough solution or reached time limit, stop searching
-            if best_distance < float('inf') and time.time() - start_time > time_limit:
-                return
+            backtrack(i + 1, current_distance + dist_to_bin)
             
             # Backtrack
             visited[i] = False
+            visited_count -= 1
+            visited_mask ^= 1 << i
             current_route.pop()
-            current_load -= priority_bins[i].current_level
+            current_load -= levels[i]
+            
+            # Stop searching once the time limit is reached
+            if timed_out:
+                return
     
     # Start the backtracking process
-    backtrack(start_point, 0)
+    backtrack(0, 0)
+    
+    metrics = get_metrics()
+    metrics.increment("search_nodes_total", nodes, solver="backtracking")
+    metrics.increment("search_prunes_total", prunes, solver="backtracking")
+    if timed_out:
+        metrics.increment("solver_time_limit_total", solver="backtracking")
     
     # If we couldn't find a route with backtracking (due to time constraints),
     # fall back to a greedy approach
     if not best_route and priority_bins:
-        print(f"Fallback to greedy algorithm for truck {truck.truck_id}")
-        return greedy_route_optimization(truck, priority_bins, start_point)
+        return _greedy_fallback(truck, priority_bins, start_point, dist_matrix, "backtracking",
+                                "time_limit" if timed_out else "no_route")
         
     return best_route, best_distance
 
-def greedy_route_optimization(truck, waste_bins, start_point=None):
+def optimize_route_dp(truck, waste_bins, start_point=None, max_bins=DP_MAX_BINS, time_limit=5.0, dist_matrix=None,
+                      initial_route=None, on_improve=None):
+    """
+    Exact Held-Karp (bitmask dynamic programming) solver with capacity tracking.
+    Returns the optimal route and its distance, in the same shape as
+    optimize_route_backtracking.
+    
+    A route is complete once every candidate bin is visited or the truck is at
+    least 90% full, the same stopping rule the backtracking search uses. Subsets
+    are expanded one size at a time over a precomputed distance matrix, and each
+    subset only keeps the cheapest path ending at each bin, so the search never
+    revisits a permutation. The greedy route, or initial_route (such as a cached
+    tour) when it is complete and shorter, is the first upper bound; after every
+    layer its DP_DIVES most promising subsets are finished greedily (and tidied
+    by local search) to tighten it. Each new layer is cut down by the lower bound
+    before it is built. Like optimize_route_backtracking it is anytime:
+    on_improve(route, distance, elapsed) hears of every shorter route found.
+    
+    Past EXACT_HANDOFF_BINS candidates, a route that has to visit all or all but
+    EXACT_HANDOFF_SLACK of them is handed to optimize_route_backtracking, which
+    proves those far faster. Together they prove the optimum for up to 22 bins
+    (DP_MAX_BINS) within the default time_limit, in about 4 s at worst; at 25 bins
+    routes that leave out three to six of them can take longer. When time_limit or
+    MAX_DP_STATES stops the search first, it says so and returns the best route
+    found so far, which need not be optimal.
+    
+    Args:
+        truck: The truck object
+        waste_bins: List of waste bins that need collection
+        start_point: Starting location coordinates (x,y)
+        max_bins: Maximum number of bins to consider for optimization (limits complexity)
+        time_limit: Maximum time in seconds to spend on optimization
+        dist_matrix: Shared DistanceMatrix to read distances from
+        initial_route: Route to warm-start the upper bound from
+        on_improve: Called as on_improve(route, distance, elapsed) with each better route
+    """
+    if not waste_bins:
+        return [], 0
+    
+    priority_bins = select_priority_bins(truck, waste_bins, max_bins)
+    
+    # Only bins the truck can actually take part in the search
+    candidates = [bin for bin in priority_bins
+                  if bin.current_level <= truck.capacity
+                  and (not truck.bin_type_specialty
+                       or bin.bin_type == truck.bin_type_specialty
+                       or bin.bin_type == "Mixed")]
+    n = len(candidates)
+    if n == 0 or n > 62:
+        return _greedy_fallback(truck, priority_bins, start_point, dist_matrix, "dp",
+                                "no_candidates" if n == 0 else "too_many_bins")
+    
+    levels = np.array([bin.current_level for bin in candidates], dtype=float)
+    # Large routes over all or nearly all of the bins are branch and bound's to prove
+    if n > EXACT_HANDOFF_BINS and _fill_slack(truck, levels) <= EXACT_HANDOFF_SLACK:
+        return optimize_route_backtracking(truck, candidates, start_point, max_bins=n, time_limit=time_limit,
+                                           dist_matrix=dist_matrix, initial_route=initial_route, on_improve=on_improve)
+    
+    start_time = time.time()
+    states = pruned = 0
+    stop = None
+    
+    # Distance matrix with the start point at index 0 and candidate i at index i + 1
+    dist = route_distance_matrix(candidates, start_point, dist_matrix)
+    bin_dist = dist[1:, 1:]
+    # Path costs are float32, so the legs added to them are too
+    step = bin_dist.astype(np.float32)
+    
+    bits = np.left_shift(1, np.arange(n, dtype=np.int64))
+    full_mask = (1 << n) - 1
+    threshold = truck.capacity * 0.9
+    
+    # Seed the upper bound with the greedy route, or the initial route, when complete
+    best_distance = float('inf')
+    known_route, known_distance = greedy_route_optimization(truck, candidates, start_point, dist_matrix)
+    if len(known_route) == n or sum(bin.current_level for bin in known_route) >= threshold:
+        best_distance = known_distance
+    warm_route, warm_distance = _warm_start(truck, candidates, initial_route, dist, threshold)
+    if warm_distance < best_distance:
+        known_route, known_distance = warm_route, warm_distance
+        best_distance = warm_distance
+    if on_improve is not None and best_distance < float('inf'):
+        on_improve(known_route, known_distance, time.time() - start_time)
+    
+    # Admissible lower bounds on the distance still to travel. A route needs at least
+    # `more` further bins, the fewest unvisited bins that still fit and could fill the
+    # truck (largest first), or every unvisited bin when they cannot. Each is reached
+    # over at least its cheapest incoming edge, so the `more` cheapest of those among
+    # the unvisited bins that fit bound the rest of the route. Splitting every leg
+    # half to each end gives a second bound: half the cheapest leg out of the path's
+    # end, plus half of each new bin's cheapest way in and its cheapest other edge
+    # (its cheapest way out when distances are not symmetric), less that other edge
+    # for the last bin, which has no leg out.
+    if n > 1:
+        legs = np.where(np.eye(n, dtype=bool), np.inf, bin_dist)
+        incoming, outgoing = legs.min(axis=0), legs.min(axis=1)
+        other = np.sort(legs, axis=0)[1] if n > 2 and np.allclose(bin_dist, bin_dist.T) else outgoing
+    else:
+        incoming = outgoing = other = np.zeros(1)
+    halves = (incoming + other) / 2
+    last_relief = float(other.max()) / 2
+    out_half = (outgoing / 2).astype(np.float32)
+    by_level = np.argsort(-levels, kind="stable")
+    by_incoming = np.argsort(incoming, kind="stable")
+    by_halves = np.argsort(halves, kind="stable")
+    
+    def lower_bound(masks, loads, visited):
+        room = truck.capacity - loads
+        gathered = loads.copy()
+        more = np.zeros(len(masks), dtype=np.int16)
+        stuck = np.zeros(len(masks), dtype=bool)
+        usable = {}
+        for j in by_level:
+            free = (masks & bits[j]) == 0
+            fits = room >= levels[j]
+            stuck |= free > fits
+            usable[j] = take = free & fits
+            take = take & (gathered < threshold)
+            np.add(gathered, levels[j], out=gathered, where=take)
+            more += take
+        # A subset that cannot fill the truck has to visit every bin left, which all must fit
+        filling = gathered >= threshold
+        more = np.where(filling, more, n - visited)
+        bound = np.zeros(len(masks))
+        counted = np.zeros(len(masks), dtype=np.int16)
+        for j in by_incoming:
+            take = usable[j] & (counted < more)
+            np.add(bound, incoming[j], out=bound, where=take)
+            counted += take
+        half = np.zeros(len(masks))
+        counted[:] = 0
+        for j in by_halves:
+            take = usable[j] & (counted < more)
+            np.add(half, halves[j], out=half, where=take)
+            counted += take
+        half = np.where(more > 0, half - last_relief, 0.0)
+        bound[~filling & stuck] = np.inf
+        # The second bound still needs out_half of the path's end added
+        return bound, half
+    
+    # Layer k holds every feasible subset of k + 1 bins: sorted masks, their loads,
+    # the cheapest path cost ending at each bin and the bin visited just before it
+    masks = bits.copy()
+    loads = levels.copy()
+    cost = np.full((n, n), np.inf, dtype=np.float32)
+    cost[np.arange(n), np.arange(n)] = dist[0, 1:]
+    layers = [(masks, np.full((n, n), -1, dtype=np.int8))]
+    bound, half = lower_bound(masks, loads, 1)
+    best_state = None
+    
+    def path(state):
+        # Walk the parent pointers back from a state to the bins of its path, in order
+        layer, idx, end = state
+        mask = int(layers[layer][0][idx])
+        order = []
+        while True:
+            order.append(end)
+            prev = int(layers[layer][1][idx, end])
+            if layer == 0:
+                break
+            mask ^= 1 << end
+            layer -= 1
+            idx = int(np.searchsorted(layers[layer][0], mask))
+            end = prev
+        order.reverse()
+        return order
+    
+    def length(order):
+        # Sum the distance along the route rather than trusting the accumulated search value
+        return float(dist[0, order[0] + 1] + sum(dist[a + 1, b + 1] for a, b in zip(order, order[1:])))
+    
+    def rebuild(state):
+        order = path(state)
+        return [candidates[i] for i in order], length(order)
+    
+    def dive(state):
+        # Finish a partial path with the nearest bin that still fits until it is complete
+        order = path(state)
+        visited = set(order)
+        load = float(levels[order].sum())
+        while load < threshold and len(visited) < n:
+            fitting = [j for j in range(n) if j not in visited and load + levels[j] <= truck.capacity]
+            if not fitting:
+                return None
+            j = min(fitting, key=lambda j: bin_dist[order[-1], j])
+            order.append(j)
+            visited.add(j)
+            load += levels[j]
+        return order
+    
+    while True:
+        # Record the cheapest completed route in this layer
+        done = (loads >= threshold) | (masks == full_mask)
+        if done.any():
+            done_idx = np.flatnonzero(done)
+            ends = cost[done_idx].argmin(axis=1)
+            totals = cost[done_idx, ends]
+            i = totals.argmin()
+            if totals[i] < best_distance:
+                best_distance = float(totals[i])
+                best_state = (len(layers) - 1, int(done_idx[i]), int(ends[i]))
+                if on_improve is not None:
+                    on_improve(*rebuild(best_state), time.time() - start_time)
+        
+        # Only expand open subsets that can still beat the best route found so far
+        open_idx = np.flatnonzero(~done)
+        states += len(masks)
+        if len(open_idx):
+            least = np.maximum(cost[open_idx].min(axis=1) + bound[open_idx],
+                               (cost[open_idx] + out_half).min(axis=1) + half[open_idx])
+            # Complete the most promising subsets greedily: a short route found early
+            # prunes every layer still to come
+            for i in open_idx[np.argsort(least, kind="stable")[:DP_DIVES]]:
+                order = dive((len(layers) - 1, int(i), int(cost[i].argmin())))
+                if order is not None and length(order) < best_distance:
+                    known_route, known_distance, _ = improve_route(
+                        [candidates[j] for j in order], start_point, dist_matrix, time_limit=0.05)
+                    best_distance, best_state = known_distance, None
+                    if on_improve is not None:
+                        on_improve(known_route, known_distance, time.time() - start_time)
+            unpruned = len(open_idx)
+            open_idx = open_idx[least < best_distance]
+            pruned += unpruned - len(open_idx)
+        if len(open_idx) == 0:
+            break
+        if time.time() - start_time > time_limit:
+            stop = "time_limit"
+            break
+        
+        # Extend every open subset by one bin that still fits in the truck
+        open_masks, open_loads, open_cost = masks[open_idx], loads[open_idx], cost[open_idx]
+        new_masks, new_loads, new_ends, new_costs, new_parents = [], [], [], [], []
+        for k in range(n):
+            # A layer can take seconds on its own, so the clock is read for every bin
+            if time.time() - start_time > time_limit:
+                stop = "time_limit"
+                break
+            sel = np.flatnonzero(((open_masks & bits[k]) == 0) & (open_loads + levels[k] <= truck.capacity))
+            if len(sel) == 0:
+                continue
+            trial = open_cost[sel] + step[:, k]
+            prev = trial.argmin(axis=1)
+            trial_cost = np.take_along_axis(trial, prev[:, None], axis=1)[:, 0]
+            keep = trial_cost < best_distance
+            pruned += len(keep) - int(keep.sum())
+            sel, prev, trial_cost = sel[keep], prev[keep], trial_cost[keep]
+            new_masks.append(open_masks[sel] | bits[k])
+            new_loads.append(open_loads[sel] + levels[k])
+            new_ends.append(np.full(len(sel), k, dtype=np.int8))
+            new_costs.append(trial_cost)
+            new_parents.append(prev.astype(np.int8))
+        
+        if stop or not new_masks:
+            break
+        
+        masks, first, inverse = np.unique(np.concatenate(new_masks), return_index=True, return_inverse=True)
+        loads = np.concatenate(new_loads)[first]
+        ends, costs, parent_ends = np.concatenate(new_ends), np.concatenate(new_costs), np.concatenate(new_parents)
+        
+        # Bound the new subsets before their cost and parent rows are built, so the
+        # layer only ever holds subsets that can still beat the best route
+        least = np.full(len(masks), np.inf, dtype=np.float32)
+        np.minimum.at(least, inverse, costs)
+        least_half = np.full(len(masks), np.inf, dtype=np.float32)
+        np.minimum.at(least_half, inverse, costs + out_half[ends])
+        open_new = (loads < threshold) & (masks != full_mask)
+        bound = np.zeros(len(masks))
+        half = np.zeros(len(masks))
+        if open_new.any():
+            bound[open_new], half[open_new] = lower_bound(masks[open_new], loads[open_new], len(layers) + 1)
+        keep = np.where(open_new, np.maximum(least + bound, least_half + half), least) < best_distance
+        pruned += len(keep) - int(keep.sum())
+        if not keep.all():
+            row = np.cumsum(keep) - 1
+            kept = keep[inverse]
+            masks, loads, bound, half = masks[keep], loads[keep], bound[keep], half[keep]
+            inverse, ends, costs, parent_ends = row[inverse[kept]], ends[kept], costs[kept], parent_ends[kept]
+        if len(masks) == 0:
+            break
+        if len(masks) * n > MAX_DP_STATES:
+            stop = "state_limit"
+            break
+        cost = np.full((len(masks), n), np.inf, dtype=np.float32)
+        cost[inverse, ends] = costs
+        parents = np.full((len(masks), n), -1, dtype=np.int8)
+        parents[inverse, ends] = parent_ends
+        layers.append((masks, parents))
+    
+    metrics = get_metrics()
+    metrics.increment("search_nodes_total", states, solver="dp")
+    metrics.increment("search_prunes_total", pruned, solver="dp")
+    if stop:
+        metrics.increment(f"solver_{stop}_total", solver="dp")
+    
+    if stop and (known_route or best_state is not None):
+        print(f"DP search for truck {truck.truck_id} stopped by its {stop.replace('_', ' ')}; "
+              f"the best route found is kept")
+    if best_state is None:
+        if known_route and best_distance < float('inf'):
+            # Nothing the layers completed beat the greedy, initial or dived route:
+            # it is the optimum, or the best route known when the search was stopped
+            return known_route, known_distance
+        return _greedy_fallback(truck, priority_bins, start_point, dist_matrix, "dp", stop or "no_route")
+    
+    return rebuild(best_state)
+
+def greedy_route_optimization(truck, waste_bins, start_point=None, dist_matrix=None, spatial_index=None):
     """
     A faster greedy algorithm for route optimization when backtracking is too slow.
     Always picks the nearest bin that fits in the truck.
+    
+    spatial_index selects the nearest-bin backend: True uses a GridIndex over the bin
+    locations (Euclidean distances, no distance matrix needed), False scans a
+    distance matrix row per step, and None picks the grid for large bin lists
+    unless dist_matrix holds other than straight-line distances.
     """
     route = []
-    remaining_bins = waste_bins.copy()
     current_load = 0
     total_distance = 0
-    current_position = start_point
+    if not waste_bins:
+        return route, total_distance
     
-    while remaining_bins and current_load < truck.capacity * 0.9:
+    if spatial_index is None:
+        spatial_index = (len(waste_bins) >= SPATIAL_INDEX_MIN_BINS
+                         and (dist_matrix is None or dist_matrix.euclidean))
+    if spatial_index:
+        return _greedy_route_grid(truck, waste_bins, start_point)
+    
+    dist = route_distance_matrix(waste_bins, start_point, dist_matrix)
+    levels = np.array([bin.current_level for bin in waste_bins], dtype=float)
+    
+    # Bins still to visit, leaving out those the truck's specialty excludes
+    remaining = np.array([not truck.bin_type_specialty
+                          or bin.bin_type == truck.bin_type_specialty
+                          or bin.bin_type == "Mixed"
+                          for bin in waste_bins])
+    position = 0
+    
+    while remaining.any() and current_load < truck.capacity * 0.9:
         # Find nearest bin that fits
-        nearest_bin = None
-        nearest_distance = float('inf')
-        nearest_idx = -1
+        fits = remaining & (current_load + levels <= truck.capacity)
+        if not fits.any():
+            # No more bins fit in the truck
+            break
         
-        for i, bin in enumerate(remaining_bins):
-            # Skip if bin would overload truck
-            if current_load + bin.current_level > truck.capacity:
-                continue
-                
-            # Skip if truck specializes in a waste type and this bin doesn't match
-            if (truck.bin_type_specialty and 
-                bin.bin_type != truck.bin_type_specialty and 
-                bin.bin_type != "Mixed"):
-                continue
-            
-            # Calculate distance to this bin
-            if current_position:
-                if route:
-                    dist = distance(route[-1], bin)
-                else:
-                    # Distance from start point to first bin
-                    start_bin = WasteBin(bin_id="-1", location=current_position, fill_level=0)
-                    dist = distance(start_bin, bin)
-            else:
-                dist = 0
-                
-            if dist < nearest_distance:
-                nearest_distance = dist
-                nearest_bin = bin
-                nearest_idx = i
+        row = np.where(fits, dist[position, 1:], np.inf)
+        nearest_idx = int(row.argmin())
         
-        # If found a bin that fits, add it to the route
-        if nearest_bin:
-            route.append(nearest_bin)
-            current_load += nearest_bin.current_level
-            total_distance += nearest_distance
-            current_position = nearest_bin.location
-            del remaining_bins[nearest_idx]
+        route.append(waste_bins[nearest_idx])
+        current_load += levels[nearest_idx]
+        total_distance += float(row[nearest_idx])
+        position = nearest_idx + 1
+        remaining[nearest_idx] = False
+    
+    return route, total_distance
+
+def _greedy_route_grid(truck, waste_bins, start_point):
+    """Greedy nearest-bin route using a GridIndex for the nearest feasible bin lookups"""
+    route = []
+    current_load = 0
+    total_distance = 0
+    
+    # Bins the truck's specialty excludes never enter the index
+    eligible = [i for i, bin in enumerate(waste_bins)
+                if not truck.bin_type_specialty
+                or bin.bin_type == truck.bin_type_specialty
+                or bin.bin_type == "Mixed"]
+    index = GridIndex([bin.location for bin in waste_bins], eligible)
+    
+    # Capacity only shrinks, so a bin that no longer fits can be dropped for good
+    def fits(i):
+        return current_load + waste_bins[i].current_level <= truck.capacity
+    
+    current_position = start_point
+    while len(index) and current_load < truck.capacity * 0.9:
+        if current_position is None:
+            # Without a start point every first bin is free: take the first that fits
+            nearest_idx = next((i for i in eligible if fits(i)), None)
+            nearest_distance = 0
         else:
+            nearest_idx, nearest_distance = index.nearest(current_position, fits)
+        if nearest_idx is None:
             # No more bins fit in the truck
             break
+        
+        nearest_bin = waste_bins[nearest_idx]
+        index.remove(nearest_idx)
+        route.append(nearest_bin)
+        current_load += nearest_bin.current_level
+        total_distance += nearest_distance
+        current_position = nearest_bin.location
     
     return route, total_distance
 
-def assign_trucks_to_districts(trucks, districts):
-    """Assign trucks to districts based on waste volume and type"""
-    assignments = {}
+def sweep_clusters(waste_bins, capacity, start_point=None, max_bins=15):
+    """
+    Split bins into spatial clusters by sweeping a ray around start_point (or the
+    bins' centroid without one). Bins are taken in angle order, starting after the
+    widest empty sector, and a cluster is closed before it would reach `capacity`
+    or hold more than max_bins bins. Sorting dominates, so this is O(n log n).
+    """
+    if not waste_bins:
+        return []
+    points = np.array([bin.location for bin in waste_bins], dtype=float)
+    center = points.mean(axis=0) if start_point is None else np.asarray(start_point, dtype=float)
+    angles = np.arctan2(points[:, 1] - center[1], points[:, 0] - center[0])
+    order = np.argsort(angles, kind="stable")
     
-    # Sort districts by total waste volume
-    districts_by_volume = sorted(
-        districts,
-        key=lambda d: sum(bin.current_level for bin in d.waste_bins if bin.emptying_needed),
-        reverse=True
-    )
+    # Start right after the widest gap between neighbouring angles
+    sorted_angles = angles[order]
+    gaps = np.diff(np.concatenate((sorted_angles, [sorted_angles[0] + 2 * math.pi])))
+    order = np.roll(order, -(int(gaps.argmax()) + 1))
     
-    # Calculate waste type composition per district for better truck assignment
-    district_stats = {}
-    for district in districts:
-        recyclable = sum(bin.current_level for bin in district.waste_bins 
-                         if bin.bin_type == "Recyclable" and bin.emptying_needed)
-        non_recyclable = sum(bin.current_level for bin in district.waste_bins 
-                            if bin.bin_type == "Non Recyclable" and bin.emptying_needed)
-        mixed = sum(bin.current_level for bin in district.waste_bins 
-                   if bin.bin_type == "Mixed" and bin.emptying_needed)
-        total = recyclable + non_recyclable + mixed
+    clusters = []
+    cluster, load = [], 0
+    for i in order:
+        bin = waste_bins[i]
+        if cluster and (load + bin.current_level >= capacity or len(cluster) >= max_bins):
+            clusters.append(cluster)
+            cluster, load = [], 0
+        cluster.append(bin)
+        load += bin.current_level
+    clusters.append(cluster)
+    return clusters
+
+def trips_distance(trips, start_point, leg):
+    """
+    Distance of driving the trips (lists of bins) in turn. leg(a, b) is the distance between two
+    bins, with None for the start point. Every trip leaves the start point and all
+    but the last return to it to unload; without a start point the trips are
+    simply chained.
+    """
+    total = 0.0
+    for k, trip in enumerate(trips):
+        if start_point is not None:
+            total += leg(None, trip[0])
+            if k + 1 < len(trips):
+                total += leg(trip[-1], None)
+        elif k > 0:
+            total += leg(trips[k - 1][-1], trip[0])
+        total += sum(leg(trip[i], trip[i + 1]) for i in range(len(trip) - 1))
+    return total
+
+def optimize_route_clustered(truck, waste_bins, start_point=None, max_bins=None, cluster_bins=15, time_limit=5.0,
+                             dist_matrix=None, solver=optimize_route_dp, deadline=None, return_trips=False):
+    """
+    Cluster-first, route-second solver for districts too large for the exact solvers.
+    Returns a route over every priority bin and its distance; with return_trips
+    the route comes as its list of trips, one per cluster.
+    
+    Priority bins are split with sweep_clusters into clusters that each stay below
+    90% of the truck's capacity, so the exact solver has to visit every bin of a
+    cluster. Each cluster is solved with solver, and the clusters are stitched
+    into one route: each cluster is a trip, after which the truck goes back to
+    start_point to unload, and those legs count towards the distance. The
+    cluster whose route ends furthest from start_point goes last, to save the
+    longest return leg. Without a start point the clusters are simply chained.
+    
+    Args:
+        truck: The truck object
+        waste_bins: List of waste bins that need collection
+        start_point: Starting location coordinates (x,y)
+        max_bins: Maximum number of bins to cover (None for all of them)
+        cluster_bins: Maximum number of bins per cluster
+        time_limit: Maximum time in seconds for each cluster's solver call
+        dist_matrix: Shared DistanceMatrix to read distances from
+        solver: Exact solver used per cluster, called like optimize_route_dp
+        deadline: Overall time budget in seconds, shared out evenly over the clusters
+            still to solve (each still gets at most time_limit)
+        return_trips: Return the route as a list of trips
+    """
+    if not waste_bins:
+        return [], 0
+    
+    priority_bins = select_priority_bins(truck, waste_bins, max_bins or len(waste_bins))
+    candidates = [bin for bin in priority_bins
+                  if not truck.bin_type_specialty
+                  or bin.bin_type == truck.bin_type_specialty
+                  or bin.bin_type == "Mixed"]
+    if not candidates:
+        route, total = _greedy_fallback(truck, priority_bins, start_point, dist_matrix, "clustered", "no_candidates")
+        return ([route] if route else [], total) if return_trips else (route, total)
+    
+    start_time = time.time()
+    clusters = sweep_clusters(candidates, truck.capacity * 0.9, start_point, cluster_bins)
+    paths = []
+    for k, cluster in enumerate(clusters):
+        limit = time_limit
+        if deadline is not None:
+            limit = min(time_limit, max(deadline - (time.time() - start_time), 0.0) / (len(clusters) - k))
+        route, _ = solver(truck, cluster, start_point, max_bins=len(cluster), time_limit=limit,
+                          dist_matrix=dist_matrix)
+        if route:
+            paths.append(route)
+    
+    # Legs are read from the shared matrix when it covers the bins, since it may
+    # hold road rather than straight-line distances
+    if dist_matrix is not None and dist_matrix.covers(candidates):
+        def leg(a, b):
+            if a is None or b is None:
+                return float(dist_matrix.submatrix([a or b], start_point)[0, 1])
+            return dist_matrix.distance(a, b)
+    else:
+        def leg(a, b):
+            if a is None or b is None:
+                return distance_to_point(a or b, start_point)
+            return distance(a, b)
+    
+    if start_point is not None:
+        paths.sort(key=lambda path: leg(path[-1], None))
+    total = trips_distance(paths, start_point, leg)
+    if return_trips:
+        return paths, total
+    return [bin for path in paths for bin in path], total
+
+def _solver_parameters(solver):
+    """
+    The parameters of solver, looking through functools.wraps wrappers to the
+    solver they wrap
+    """
+    try:
+        return inspect.signature(solver, follow_wrapped=True).parameters
+    except (TypeError, ValueError):
+        return {}
+
+def _solver_options(solver, **options):
+    """The options, among those not None, that solver names as parameters"""
+    parameters = _solver_parameters(solver)
+    return {name: value for name, value in options.items() if value is not None and name in parameters}
+
+def _deadline_option(solver, deadline):
+    """
+    deadline as the solver's deadline or time_limit, whichever it names. A
+    wrapper that only takes **kwargs gets time_limit, which every time-bounded
+    solver here takes; nothing else is forwarded to it blindly.
+    """
+    parameters = _solver_parameters(solver)
+    if "deadline" in parameters:
+        return {"deadline": deadline}
+    if "time_limit" in parameters or any(parameter.kind is inspect.Parameter.VAR_KEYWORD
+                                         for parameter in parameters.values()):
+        return {"time_limit": deadline}
+    return {}
+
+def plan_district_route(truck, waste_bins, start_point=(0, 0), solver=optimize_route_dp, dist_matrix=None, local_search_time=1.0,
+                        initial_route=None, deadline=None, on_improve=None):
+    """
+    Build a route for one truck with the given solver, then tighten it with the
+    2-opt / Or-opt local search. Returns the route, its distance, the distance
+    the local search saved and the number of bins of each of its trips (None for
+    a single trip). Solvers that take return_trips (see optimize_route_clustered)
+    hand back routes that unload at start_point on the way. A local_search_time
+    of 0 skips the improvement stage, and so does a route of several trips.
+    initial_route is handed to solvers that take one, to warm-start them.
+    
+    deadline bounds the seconds spent on the district: it is the solver's
+    deadline or time_limit (see _deadline_option), and the local search only gets
+    what is left. The anytime solvers return the best route found by then.
+    on_improve is handed to solvers that take it (see optimize_route_backtracking).
+    """
+    metrics = get_metrics()
+    start = time.perf_counter()
+    options = _solver_options(solver, initial_route=initial_route or None, on_improve=on_improve)
+    # Trips change the shape of the result, so only solvers that name the option get it
+    if "return_trips" in _solver_parameters(solver):
+        options["return_trips"] = True
+    if deadline is not None:
+        options.update(_deadline_option(solver, deadline))
+    with metrics.timer("solver"):
+        route, distance = solver(truck, waste_bins, start_point, dist_matrix=dist_matrix, **options)
+    trip_sizes = None
+    if options.get("return_trips"):
+        trip_sizes = [len(trip) for trip in route] if len(route) > 1 else None
+        route = [bin for trip in route for bin in trip]
+    if deadline is not None:
+        local_search_time = min(local_search_time, max(deadline - (time.perf_counter() - start), 0.0))
+    improved, improved_distance, saved = route, distance, 0.0
+    # The local search would not see the depot legs between trips
+    if route and local_search_time > 0 and trip_sizes is None:
+        with metrics.timer("local_search"):
+            improved, improved_distance, saved = improve_route(
+                route, start_point, dist_matrix, time_limit=local_search_time)
+    metrics.observe("district_solve_seconds", time.perf_counter() - start)
+    metrics.increment("districts_solved_total")
+    if deadline is not None and time.perf_counter() - start > deadline:
+        metrics.increment("district_deadline_missed_total")
+    if saved <= 0:
+        return route, distance, 0.0, trip_sizes
+    return improved, improved_distance, saved, trip_sizes
+
+class _JobBin(WasteBin):
+    """WasteBin rebuilt in a worker, needing emptying above the threshold its bin had"""
+    def __init__(self, bin_id, location, fill_level, capacity, bin_type, container_type, threshold):
+        super().__init__(bin_id, location, fill_level, capacity, bin_type, container_type)
+        self.threshold = threshold
+    
+    @property
+    def emptying_needed(self):
+        return self.current_level > self.threshold
+
+def district_job(truck, waste_bins, start_point=(0, 0), solver=optimize_route_dp, local_search_time=1.0,
+                 initial_route=None, dist_matrix=None, deadline=None):
+    """
+    Package one truck/district optimization as a picklable job for a worker process.
+    Only plain values travel: bin locations, levels, emptying thresholds (so a
+    forecast carries over), types, the truck's capacity, the warm-start route as indices into the bin list and, when given, the
+    district's DistanceMatrix (such as road distances) for the worker to reuse.
+    """
+    position = {id(bin): i for i, bin in enumerate(waste_bins)}
+    return {
+        "bin_ids": [bin.bin_id for bin in waste_bins],
+        "locations": [tuple(bin.location) for bin in waste_bins],
+        "levels": [bin.current_level for bin in waste_bins],
+        "thresholds": emptying_thresholds(waste_bins),
+        "capacities": [bin.capacity for bin in waste_bins],
+        "bin_types": [bin.bin_type for bin in waste_bins],
+        "container_types": [bin.container_type for bin in waste_bins],
+        "truck": (truck.truck_id, truck.capacity, truck.bin_type_specialty),
+        "start_point": start_point,
+        "solver": solver,
+        "local_search_time": local_search_time,
+        "initial_route": [position[id(bin)] for bin in initial_route or ()],
+        "dist_matrix": dist_matrix,
+        "deadline": deadline,
+        "metrics": get_metrics().enabled,
+    }
+
+def run_district_job(job):
+    """
+    Solve a job built by district_job. Returns the route as indices into the job's
+    bin list, its distance, the distance saved by local search, its trip sizes
+    (see plan_district_route), and the worker's metrics (as Metrics.to_dict) when
+    the job asks for them, else None.
+    """
+    metrics = enable_metrics(Metrics()) if job.get("metrics") else None
+    waste_bins = [
+        _JobBin(bin_id, job["locations"][i], job["levels"][i], job["capacities"][i],
+               job["bin_types"][i], job["container_types"][i], job["thresholds"][i])
+        for i, bin_id in enumerate(job["bin_ids"])
+    ]
+    truck = Truck(*job["truck"])
+    
+    route, distance, saved, trip_sizes = plan_district_route(
+        truck, waste_bins, job["start_point"], job["solver"], job.get("dist_matrix"), job["local_search_time"],
+        initial_route=[waste_bins[i] for i in job.get("initial_route", ())], deadline=job.get("deadline"))
+    position = {bin.bin_id: i for i, bin in enumerate(waste_bins)}
+    return ([position[bin.bin_id] for bin in route], distance, saved, trip_sizes,
+            metrics.to_dict() if metrics else None)
+
+def _solve_districts_parallel(pairs, start_point, solver, local_search_time, workers, cache=None,
+                              cache_key=None, dist_matrix_of=None, deadline=None):
+    """
+    Solve (district, truck) pairs in a process pool, keyed by (district_id, truck_id).
+    Pairs with an exact hit in the cache (under cache_key, the solver by default)
+    are not sent to the pool. dist_matrix_of(district), when given, supplies the
+    matrix each job carries to its worker.
+    """
+    cache_key = cache_key or solver
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for district, truck in pairs:
+            hit, warm = cache.lookup(truck, district.waste_bins, start_point, cache_key) if cache is not None else (None, None)
+            if hit:
+                results[(district.district_id, truck.truck_id)] = hit
+                continue
+            job = district_job(truck, district.waste_bins, start_point, solver, local_search_time, warm,
+                               dist_matrix_of(district) if dist_matrix_of else None, deadline)
+            futures.append((district, truck, executor.submit(run_district_job, job)))
+        # Collect in submission order so the merge does not depend on which worker finishes first
+        for district, truck, future in futures:
+            indices, distance, saved, trip_sizes, worker_metrics = future.result()
+            if worker_metrics:
+                get_metrics().merge(worker_metrics)
+            route = [district.waste_bins[i] for i in indices]
+            results[(district.district_id, truck.truck_id)] = (route, distance, saved, trip_sizes)
+            if cache is not None:
+                cache.store(truck, district.waste_bins, start_point, cache_key, route, distance, saved, trip_sizes)
+    return results
+
+def assign_trucks_to_districts(trucks, districts, solver=optimize_route_dp, local_search_time=1.0, workers=None, verbose=True,
+                               cache=None, network=None, deadline=None, on_improve=None, start_point=(0, 0)):
+    """
+    Assign trucks to districts based on waste volume and type.
+    solver is called as solver(truck, waste_bins, start_point, dist_matrix=...) and
+    must return (route, distance). Each district gets one DistanceMatrix, built on
+    first use and shared by every truck tried on it. Every route is then improved
+    with local search for up to local_search_time seconds; the distance it saved
+    is kept under "distance_saved" in each assignment.
+    
+    With workers > 1 the truck for each district is planned first, all districts
+    are solved at once in a process pool (solver must then be a module-level
+    function), and the results are merged back in the same order the sequential
+    run would use. Any pair the plan did not foresee is solved in this process.
+    verbose=False silences the per-district progress lines. Every route starts from
+    start_point, the depot.
+    
+    With a RouteCache, a district whose bins, truck and solver match a stored
+    route exactly reuses it without solving; a near match warm-starts the solver
+    from the stored tour. Every newly solved route is stored.
+    
+    With a RoadNetwork each district's matrix is a RoadDistanceMatrix (start point
+    as the depot), whose rows are filled by Dijkstra on first use and then shared
+    the same way; parallel jobs carry it to their worker. All solvers and the
+    local search then plan on road distances. Routes cached with and without a
+    network, or under different local search times or deadlines, are kept apart.
+    
+    deadline gives every district (and truck tried on it) that many seconds, after
+    which the best route so far is used (see plan_district_route), so the run
+    takes a predictable time. on_improve(district_id, truck_id, route, distance,
+    elapsed) hears of every better route the anytime solvers find; it is only
+    called for districts solved in this process.
+    
+    Routes of bins from one BinTable come back as Routes, int32 row indices into
+    the table that read like the list of bins. "trips" holds the truckloads the
+    route is driven in, each with its "route" and "load"; only routes that unload
+    on the way, such as optimize_route_clustered's, have more than one.
+    """
+    results = {}
+    dist_matrices = {}
+    cache_key = solver if network is None else f"{solver_name(solver)}@roads:{network.checksum}"
+    # Local search reshapes every route, so a longer run must not reuse a shorter one's
+    cache_key = f"{solver_name(cache_key)}@local_search:{local_search_time:g}"
+    if deadline is not None:
+        # A route cut short by the deadline must not answer a run that has more time
+        cache_key = f"{solver_name(cache_key)}@deadline:{deadline:g}"
+    
+    # Solvers only route bins that need emptying (or every bin when none do),
+    # so the matrix covers those and memory stays proportional to the district
+    def dist_matrix_of(district):
+        dist_matrix = dist_matrices.get(district.district_id)
+        if dist_matrix is None:
+            candidates = [bin for bin in district.waste_bins if bin.emptying_needed] or district.waste_bins
+            if network is None:
+                dist_matrix = DistanceMatrix(candidates, start_point)
+            else:
+                dist_matrix = network.distance_matrix(candidates, start_point)
+            dist_matrices[district.district_id] = dist_matrix
+        return dist_matrix
+    
+    if workers and workers > 1:
+        planned = []
         
-        district_stats[district.district_id] = {
-            "recyclable": recyclable,
-            "non_recyclable": non_recyclable,
-            "mixed": mixed,
-            "total": total,
-            "district": district
-        }
+        def plan(district, truck, label):
+            planned.append((district, truck))
+            return [None], 0, 0.0, []
+        
+        _assign_districts(trucks, districts, plan)
+        results = _solve_districts_parallel(planned, start_point, solver, local_search_time, workers, cache,
+                                            cache_key, dist_matrix_of if network is not None else None, deadline)
+    
+    def solve(district, truck, label):
+        if verbose:
+            print(f"Optimizing routes for District {district.district_id} with Truck {truck.truck_id} ({label})...")
+        key = (district.district_id, truck.truck_id)
+        if key in results:
+            return results[key]
+        warm = None
+        if cache is not None:
+            hit, warm = cache.lookup(truck, district.waste_bins, start_point, cache_key)
+            if hit:
+                return hit
+        
+        progress = None
+        if on_improve is not None:
+            progress = lambda route, distance, elapsed: on_improve(
+                district.district_id, truck.truck_id, route, distance, elapsed)
+        result = plan_district_route(truck, district.waste_bins, start_point, solver, dist_matrix_of(district),
+                                     local_search_time, warm, deadline, progress)
+        if cache is not None:
+            cache.store(truck, district.waste_bins, start_point, cache_key, *result)
+        return result
+    
+    assignments = _assign_districts(trucks, districts, solve)
+    for assignment in assignments.values():
+        assignment["truck"].route = assignment["route"]
+    return assignments
+
+def district_trips(route, trip_sizes=None):
+    """
+    The trips of a route, each with its "route" (a slice of route) and its "load".
+    trip_sizes gives the number of bins of each trip; None is a single trip.
+    """
+    trips, first = [], 0
+    for size in [len(route)] if trip_sizes is None else trip_sizes:
+        trip = route[first:first + size]
+        trips.append({"route": trip, "load": float(sum(bin.current_level for bin in trip))})
+        first += size
+    return trips
+
+def _assignment(truck, route, distance, saved, trip_sizes):
+    route = as_route(route)
+    return {
+        "truck": truck,
+        "route": route,
+        "distance": distance,
+        "distance_saved": saved,
+        "trips": district_trips(route, trip_sizes),
+    }
+
+def district_waste_stats(district):
+    """
+    Waste that needs emptying in a district, per waste type. "total" covers the
+    three known types and "volume" every bin that needs emptying.
+    """
+    by_type = emptying_waste_by_type(district.waste_bins)
+    recyclable = by_type.get("Recyclable", 0)
+    non_recyclable = by_type.get("Non Recyclable", 0)
+    mixed = by_type.get("Mixed", 0)
+    
+    return {
+        "recyclable": recyclable,
+        "non_recyclable": non_recyclable,
+        "mixed": mixed,
+        "total": recyclable + non_recyclable + mixed,
+        "volume": sum(by_type.values()),
+        "district": district
+    }
+
+def _assign_districts(trucks, districts, solve):
+    """
+    Decide which truck serves which district. solve(district, truck, label) returns
+    (route, distance, distance_saved, trip_sizes); a district only keeps a truck
+    whose route is non-empty.
+    """
+    assignments = {}
+    
+    # Calculate waste type composition per district for better truck assignment
+    district_stats = {district.district_id: district_waste_stats(district) for district in districts}
+    
+    # Sort districts by total waste volume
+    districts_by_volume = sorted(districts, key=lambda d: district_stats[d.district_id]["volume"], reverse=True)
     
     # Sort trucks by capacity
     available_trucks = sorted(trucks, key=lambda t: t.capacity, reverse=True)
@@ -228,15 +1211,9 @@ def assign_trucks_to_districts(trucks, districts):
             # Look for recyclable specialized truck
             for i, truck in enumerate(available_trucks):
                 if truck.bin_type_specialty == "Recyclable":
-                    print(f"Optimizing routes for District {district.district_id} with Truck {truck.truck_id} (Recyclable specialist)...")
-                    route, distance = optimize_route_backtracking(truck, district.waste_bins, (0, 0))
-                    if route:
-                        truck.route = route
-                        assignments[district.district_id] = {
-                            "truck": truck,
-                            "route": route,
-                            "distance": distance
-                        }
+                    result = solve(district, truck, "Recyclable specialist")
+                    if result[0]:
+                        assignments[district.district_id] = _assignment(truck, *result)
                         available_trucks.pop(i)
                         break
         
@@ -244,15 +1221,9 @@ def assign_trucks_to_districts(trucks, districts):
             # Look for non-recyclable specialized truck
             for i, truck in enumerate(available_trucks):
                 if truck.bin_type_specialty == "Non Recyclable":
-                    print(f"Optimizing routes for District {district.district_id} with Truck {truck.truck_id} (Non-Recyclable specialist)...")
-                    route, distance = optimize_route_backtracking(truck, district.waste_bins, (0, 0))
-                    if route:
-                        truck.route = route
-                        assignments[district.district_id] = {
-                            "truck": truck,
-                            "route": route,
-                            "distance": distance
-                        }
+                    result = solve(district, truck, "Non-Recyclable specialist")
+                    if result[0]:
+                        assignments[district.district_id] = _assignment(truck, *result)
                         available_trucks.pop(i)
                         break
     
@@ -263,15 +1234,9 @@ def assign_trucks_to_districts(trucks, districts):
             
         if available_trucks:
             truck = available_trucks.pop(0)
-            print(f"Optimizing routes for District {district.district_id} with Truck {truck.truck_id} (General purpose)...")
-            route, distance = optimize_route_backtracking(truck, district.waste_bins, (0, 0))
+            result = solve(district, truck, "General purpose")
             
-            if route:
-                truck.route = route
-                assignments[district.district_id] = {
-                    "truck": truck,
-                    "route": route,
-                    "distance": distance
-                }
+            if result[0]:
+                assignments[district.district_id] = _assignment(truck, *result)
     
     return assignments 
\ No newline at end of file
@@ -0,0 +1,173 @@
+import argparse
+import contextlib
+import csv
+import io
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from models import Truck
+from main import create_trucks, load_city
+from map_coloring import map_coloring
+from route_optimization import assign_trucks_to_districts, district_waste_stats, optimize_route_clustered, optimize_route_dp
+from forecast import DEFAULT_FORECAST_HOURS, apply_forecast, print_forecast
+
+# Columns of the comparison table and CSV file, in order
+COLUMNS = ("name", "trucks", "capacity", "depot", "distance", "collected", "uncollected",
+           "bins_collected", "bins_uncollected", "districts_served", "seconds")
+
+# Districts of the city, set once in every worker process by _init_worker
+_districts = None
+
+
+def fleet_from_spec(spec):
+    """
+    Trucks from a list of {"capacity", "specialty", "count"} entries, numbered
+    from 1 in the order given. specialty may be left out for general purpose
+    trucks and count defaults to 1. None gives the create_trucks fleet.
+    """
+    if spec is None:
+        return create_trucks()
+    trucks = []
+    for entry in spec:
+        for _ in range(int(entry.get("count", 1))):
+            trucks.append(Truck(len(trucks) + 1, float(entry["capacity"]), entry.get("specialty")))
+    return trucks
+
+
+def load_scenarios(path):
+    """
+    Read scenarios from a JSON file: a list of {"name", "depot", "trucks"}, where
+    depot is [x, y] (default [0, 0]) and trucks is a fleet_from_spec list (default
+    the create_trucks fleet). Unnamed scenarios are named by their position.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    scenarios = []
+    for i, entry in enumerate(data):
+        scenarios.append({
+            "name": entry.get("name", f"scenario {i + 1}"),
+            "depot": tuple(entry.get("depot", (0, 0))),
+            "trucks": entry.get("trucks"),
+        })
+    return scenarios
+
+
+def evaluate_scenario(scenario, districts, solver=optimize_route_dp, local_search_time=1.0, deadline=None):
+    """
+    Assign the scenario's fleet to the districts from its depot and summarize the
+    result as one row of the comparison table. "uncollected" is the waste in bins
+    that need emptying but are on no route.
+    """
+    trucks = fleet_from_spec(scenario["trucks"])
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        assignments = assign_trucks_to_districts(trucks, districts, solver=solver, local_search_time=local_search_time,
+                                                 verbose=False, deadline=deadline, start_point=scenario["depot"])
+    seconds = time.perf_counter() - start
+
+    needed = sum(district_waste_stats(district)["volume"] for district in districts)
+    needed_bins = sum(1 for district in districts for bin in district.waste_bins if bin.emptying_needed)
+    collected = [bin for assignment in assignments.values() for bin in assignment["route"] if bin.emptying_needed]
+    collected_waste = float(sum(bin.current_level for bin in collected))
+    return {
+        "name": scenario["name"],
+        "trucks": len(trucks),
+        "capacity": float(sum(truck.capacity for truck in trucks)),
+        "depot": "{:g},{:g}".format(*scenario["depot"]),
+        "distance": float(sum(assignment["distance"] for assignment in assignments.values())),
+        "collected": collected_waste,
+        "uncollected": max(float(needed) - collected_waste, 0.0),
+        "bins_collected": len(collected),
+        "bins_uncollected": needed_bins - len(collected),
+        "districts_served": len(assignments),
+        "seconds": seconds,
+    }
+
+
+def _init_worker(districts):
+    # The city travels to each worker once, not with every scenario
+    global _districts
+    _districts = districts
+
+
+def _evaluate_in_worker(scenario, solver, local_search_time, deadline):
+    return evaluate_scenario(scenario, _districts, solver, local_search_time, deadline)
+
+
+def run_scenarios(scenarios, districts, workers=None, solver=optimize_route_dp, local_search_time=1.0, deadline=None):
+    """
+    Evaluate every scenario on the same districts; returns the rows in scenario
+    order. With workers > 1 scenarios run in a process pool whose workers each
+    receive the districts once (solver must then be a module-level function).
+    The districts are only read, so every scenario sees the same bins.
+    """
+    if not workers or workers <= 1:
+        return [evaluate_scenario(scenario, districts, solver, local_search_time, deadline) for scenario in scenarios]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(districts,)) as executor:
+        futures = [executor.submit(_evaluate_in_worker, scenario, solver, local_search_time, deadline)
+                   for scenario in scenarios]
+        return [future.result() for future in futures]
+
+
+def print_comparison(rows, sort_by="distance"):
+    """Print the scenario rows as a table, ordered by sort_by"""
+    print(f"\n{'Scenario':<24} {'Trucks':>6} {'Capacity':>9} {'Depot':>11} {'Distance':>10} "
+          f"{'Collected':>10} {'Uncollected':>11} {'Districts':>9} {'Time (s)':>8}")
+    for row in sorted(rows, key=lambda row: row[sort_by]):
+        print(f"{row['name'][:24]:<24} {row['trucks']:>6} {row['capacity']:>9.0f} {row['depot']:>11} "
+              f"{row['distance']:>10.1f} {row['collected']:>10.1f} {row['uncollected']:>11.1f} "
+              f"{row['districts_served']:>9} {row['seconds']:>8.2f}")
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare fleet configurations on the same city")
+    parser.add_argument("scenarios", help='JSON list of {"name", "depot": [x, y], "trucks": '
+                                          '[{"capacity", "specialty", "count"}]} scenarios')
+    parser.add_argument("--workers", type=int, default=None,
+                        help="evaluate scenarios in parallel on this many processes")
+    parser.add_argument("--max-bins", type=int, default=0,
+                        help="number of bins to load from Smart_Bin.csv, 0 for the whole file (default: 0)")
+    parser.add_argument("--snapshot", metavar="PATH", help="load the city from this snapshot, writing it if stale")
+    parser.add_argument("--forecast", type=float, nargs="?", const=DEFAULT_FORECAST_HOURS, metavar="HOURS",
+                        help=f"only collect bins projected to fill up within HOURS (default: {DEFAULT_FORECAST_HOURS:g})")
+    parser.add_argument("--cluster", action="store_true", help="use cluster-first routing for large districts")
+    parser.add_argument("--deadline", type=float, metavar="SECONDS",
+                        help="solve time per district and truck, keeping the best route found by then")
+    parser.add_argument("--local-search-time", type=float, default=1.0,
+                        help="local search budget per route (default: 1)")
+    parser.add_argument("--sort", choices=("name", "distance", "uncollected", "seconds"), default="distance",
+                        help="column the table is ordered by (default: distance)")
+    parser.add_argument("--output", metavar="CSV", help="also write the comparison to this CSV file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scenarios = load_scenarios(args.scenarios)
+
+    # The city is loaded and colored once and shared by every scenario
+    start_time = time.time()
+    districts, table, _ = load_city(args.max_bins or None, args.snapshot)
+    if args.forecast is not None and table is not None:
+        print_forecast(apply_forecast(table, args.forecast))
+    districts = map_coloring(districts)
+
+    print(f"\nEvaluating {len(scenarios)} scenarios...")
+    solver = optimize_route_clustered if args.cluster else optimize_route_dp
+    rows = run_scenarios(scenarios, districts, args.workers, solver, args.local_search_time, args.deadline)
+    print_comparison(rows, args.sort)
+    if args.output:
+        write_csv(args.output, rows)
+        print(f"\nComparison written to {args.output}")
+    print(f"\nEvaluated {len(scenarios)} scenarios in {time.time() - start_time:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
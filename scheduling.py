@@ -0,0 +1,162 @@
+from collections import defaultdict
+
+# Average truck speed in distance units per hour
+DEFAULT_SPEED = 20.0
+
+# Hours spent emptying one bin
+DEFAULT_SERVICE_TIME = 2 / 60
+
+
+def district_durations(assignments, speed=DEFAULT_SPEED, service_time=DEFAULT_SERVICE_TIME):
+    """Hours each assigned district takes: driving its route plus emptying its bins"""
+    return {
+        district_id: float(assignment["distance"]) / speed + len(assignment["route"]) * service_time
+        for district_id, assignment in assignments.items()
+    }
+
+
+def color_slots(districts):
+    """
+    Group districts into time slots by map color, in the order colors first
+    appear. Districts without a color get a slot of their own.
+    """
+    slots = {}
+    for district in districts:
+        key = district.color if district.color is not None else ("uncolored", district.district_id)
+        slots.setdefault(key, []).append(district)
+    return list(slots.values())
+
+
+def _makespan(truck_hours):
+    return max(truck_hours.values(), default=0.0)
+
+
+def balance_slots(slots, durations, truck_of, max_passes=10):
+    """
+    Move districts between slots while that shortens the schedule.
+
+    A district may only move to a slot holding none of its neighbors, so every
+    slot stays an independent set. A move is kept when it lowers the total of the
+    slot makespans, or keeps it and lowers the longest slot. Districts are tried
+    longest first. Works in place and returns the number of moves.
+    """
+    slot_of = {}
+    hours = []
+    for k, slot in enumerate(slots):
+        truck_hours = defaultdict(float)
+        for district in slot:
+            slot_of[district.district_id] = k
+            truck_hours[truck_of.get(district.district_id)] += durations.get(district.district_id, 0.0)
+        hours.append(truck_hours)
+
+    moves = 0
+    for _ in range(max_passes):
+        moved = False
+        for district in sorted((d for slot in slots for d in slot),
+                               key=lambda d: durations.get(d.district_id, 0.0), reverse=True):
+            duration = durations.get(district.district_id, 0.0)
+            if duration <= 0:
+                continue
+            truck = truck_of.get(district.district_id)
+            source = slot_of[district.district_id]
+            blocked = {slot_of[adj.district_id] for adj in district.adjacent_districts if adj.district_id in slot_of}
+
+            old_source = _makespan(hours[source])
+            hours[source][truck] -= duration
+            new_source = _makespan(hours[source])
+            best = (0.0, 0.0)
+            best_target = None
+            for target in range(len(slots)):
+                if target == source or target in blocked:
+                    continue
+                old_target = _makespan(hours[target])
+                new_target = max(old_target, hours[target][truck] + duration)
+                gain = (old_source + old_target) - (new_source + new_target)
+                # Ties on the total go to the move that shrinks the longer slot
+                balance = max(old_source, old_target) - max(new_source, new_target)
+                if (gain, balance) > best and (gain > 1e-9 or (gain > -1e-9 and balance > 1e-9)):
+                    best, best_target = (gain, balance), target
+
+            if best_target is None:
+                hours[source][truck] += duration
+                continue
+            hours[best_target][truck] += duration
+            slots[source].remove(district)
+            slots[best_target].append(district)
+            slot_of[district.district_id] = best_target
+            moves += 1
+            moved = True
+        if not moved:
+            break
+
+    slots[:] = [slot for slot in slots if slot]
+    return moves
+
+
+def schedule_collection(districts, assignments, speed=DEFAULT_SPEED, service_time=DEFAULT_SERVICE_TIME,
+                        balance=True):
+    """
+    Build a collection timetable from the map coloring.
+
+    Each color class is an independent set, so its districts can be served in the
+    same time slot without two neighbouring districts being worked at once. Slots
+    run one after another; within a slot every truck works through its own
+    districts back to back, and the slot lasts as long as its busiest truck (its
+    makespan). With balance set, balance_slots first moves districts between
+    slots to cut the total. Districts with no assignment are left out.
+
+    Returns a dict with "slots" (each with "start", "end", "makespan", "colors"
+    and "entries" of district_id, truck_id, start, end and duration, in hours),
+    "shift_time" (the end of the last slot) and "truck_hours" (the hours every
+    truck spends working).
+    """
+    durations = district_durations(assignments, speed, service_time)
+    truck_of = {district_id: assignment["truck"].truck_id for district_id, assignment in assignments.items()}
+    served = [district for district in districts if district.district_id in assignments]
+    slots = color_slots(served)
+    if balance:
+        balance_slots(slots, durations, truck_of)
+
+    timetable = {"slots": [], "shift_time": 0.0, "truck_hours": defaultdict(float)}
+    start = 0.0
+    for slot in slots:
+        entries = []
+        truck_clock = defaultdict(float)
+        for district in sorted(slot, key=lambda d: durations[d.district_id], reverse=True):
+            truck_id = truck_of[district.district_id]
+            duration = durations[district.district_id]
+            offset = truck_clock[truck_id]
+            truck_clock[truck_id] += duration
+            timetable["truck_hours"][truck_id] += duration
+            entries.append({
+                "district_id": district.district_id,
+                "truck_id": truck_id,
+                "start": start + offset,
+                "end": start + offset + duration,
+                "duration": duration,
+            })
+        makespan = max(truck_clock.values(), default=0.0)
+        timetable["slots"].append({
+            "start": start,
+            "end": start + makespan,
+            "makespan": makespan,
+            "colors": sorted({str(district.color) for district in slot}),
+            "entries": entries,
+        })
+        start += makespan
+
+    timetable["shift_time"] = start
+    timetable["truck_hours"] = dict(timetable["truck_hours"])
+    return timetable
+
+
+def print_timetable(timetable):
+    """Print a timetable from schedule_collection"""
+    for k, slot in enumerate(timetable["slots"], start=1):
+        print(f"Slot {k} ({', '.join(slot['colors'])}): {slot['start']:.2f}h - {slot['end']:.2f}h, "
+              f"makespan {slot['makespan']:.2f}h")
+        for entry in slot["entries"]:
+            print(f"  District {entry['district_id']} - Truck {entry['truck_id']}: "
+                  f"{entry['start']:.2f}h - {entry['end']:.2f}h")
+    busy = sum(timetable["truck_hours"].values())
+    print(f"Estimated fleet shift time: {timetable['shift_time']:.2f}h ({busy:.2f} truck-hours of work)")
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import numpy as np
+from bin_table import BinTable
+from models import District
+
+SNAPSHOT_VERSION = 1
+
+# Columns of BinTable stored as-is in the snapshot
+TABLE_COLUMNS = ("ids", "x", "y", "levels", "capacities", "bin_type_codes", "container_type_codes")
+
+
+def file_checksum(path):
+    """SHA-256 of a file's contents, or None when the file does not exist"""
+    try:
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256()
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+            return digest.hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def source_checksums(sources):
+    return {path: file_checksum(path) for path in sources}
+
+
+def save_snapshot(path, districts, table, district_locations, sources=(), params=None):
+    """
+    Write districts, adjacency, centroids and the bin table to an uncompressed .npz.
+
+    Every array is stored in its native dtype, so loading is a straight read with
+    no text parsing. Checksums of the source files and any params (such as the
+    bin limit) are stored alongside so load_snapshot can tell when it is stale.
+    The bins of each district must be views into `table`.
+    """
+    row_district = np.full(len(table), -1, dtype=np.int32)
+    for i, district in enumerate(districts):
+        for bin in district.waste_bins:
+            row_district[bin.index] = i
+
+    district_ids = [district.district_id for district in districts]
+    position = {district_id: i for i, district_id in enumerate(district_ids)}
+    edges = [(position[district.district_id], position[adjacent.district_id])
+             for district in districts for adjacent in district.adjacent_districts
+             if position[district.district_id] < position[adjacent.district_id]]
+
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "sources": source_checksums(sources),
+        "params": params or {},
+        "district_names": [district.name for district in districts],
+        "bin_type_names": table.bin_type_names,
+        "container_type_names": table.container_type_names,
+        "readings": list(table.readings),
+    }
+    arrays = {name: getattr(table, name) for name in TABLE_COLUMNS}
+    arrays.update({f"reading_{name}": column for name, column in table.readings.items()})
+    np.savez(
+        path,
+        meta=np.array(json.dumps(meta)),
+        district_ids=np.array(district_ids, dtype=np.int64),
+        adjacency=np.array(edges, dtype=np.int32).reshape(-1, 2),
+        centroids=np.array([district_locations.get(district_id, (np.nan, np.nan)) for district_id in district_ids],
+                           dtype=np.float64).reshape(-1, 2),
+        row_district=row_district,
+        **arrays,
+    )
+
+
+def load_snapshot(path, sources=(), params=None):
+    """
+    Load a snapshot written by save_snapshot.
+    Returns (districts, table, district_locations), or None when the file is
+    missing, from another format version, or stale: a source file changed or the
+    params differ from the ones it was saved with.
+    """
+    if not os.path.exists(path):
+        return None
+
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data["meta"]))
+        if (meta.get("version") != SNAPSHOT_VERSION
+                or meta["sources"] != source_checksums(sources)
+                or meta["params"] != (params or {})):
+            return None
+
+        table = BinTable(
+            *(data[name] for name in TABLE_COLUMNS[:5]),
+            data["bin_type_codes"], meta["bin_type_names"],
+            data["container_type_codes"], meta["container_type_names"],
+            {name: data[f"reading_{name}"] for name in meta["readings"]},
+        )
+        district_ids = data["district_ids"].tolist()
+        adjacency = data["adjacency"]
+        centroids = data["centroids"]
+        row_district = data["row_district"]
+
+    districts = [District(district_id, name) for district_id, name in zip(district_ids, meta["district_names"])]
+    for a, b in adjacency:
+        districts[a].add_adjacent_district(districts[b])
+
+    # Rows were stored in table order, which is the order bins were added to districts
+    views = table.views()
+    for row in np.flatnonzero(row_district >= 0):
+        districts[row_district[row]].add_waste_bin(views[row])
+
+    district_locations = {
+        district_id: (float(x), float(y))
+        for district_id, (x, y) in zip(district_ids, centroids)
+        if not np.isnan(x)
+    }
+    return districts, table, district_locations
@@ -0,0 +1,198 @@
+import math
+import numpy as np
+
+# Above this many centroids nearest_centroids prefers a KD-tree when SciPy is available
+KDTREE_MIN_CENTROIDS = 100
+
+
+class GridIndex:
+    """
+    Uniform grid over 2D points that supports deletion and nearest-point queries.
+
+    Points are bucketed into square cells sized for roughly `per_cell` points each.
+    A query searches rings of cells around the query point and stops as soon as no
+    unsearched cell can hold a closer point, so a nearest lookup costs about O(1)
+    cells on evenly spread data instead of a scan over every point.
+    """
+
+    def __init__(self, points, items=None, per_cell=2):
+        self.points = list(points)
+        items = range(len(self.points)) if items is None else items
+
+        xs = [x for x, _ in self.points] or [0.0]
+        ys = [y for _, y in self.points] or [0.0]
+        self.min_x, self.min_y = min(xs), min(ys)
+        width = max(max(xs) - self.min_x, 1e-9)
+        height = max(max(ys) - self.min_y, 1e-9)
+        count = max(len(self.points), 1)
+        self.cell_size = max(math.sqrt(width * height * per_cell / count), width / count, height / count)
+        self.cols = int(width / self.cell_size) + 1
+        self.rows = int(height / self.cell_size) + 1
+
+        # Only non-empty cells are kept, so deleted regions cost nothing to skip
+        self.cells = {}
+        self.size = 0
+        for i in items:
+            self.cells.setdefault(self._cell(self.points[i]), []).append(i)
+            self.size += 1
+
+    def __len__(self):
+        return self.size
+
+    def _cell(self, point):
+        col = min(max(int((point[0] - self.min_x) / self.cell_size), 0), self.cols - 1)
+        row = min(max(int((point[1] - self.min_y) / self.cell_size), 0), self.rows - 1)
+        return col, row
+
+    def remove(self, i):
+        """Delete item i from the index"""
+        cell = self._cell(self.points[i])
+        bucket = self.cells[cell]
+        bucket.remove(i)
+        if not bucket:
+            del self.cells[cell]
+        self.size -= 1
+
+    def _ring(self, center, radius):
+        col, row = center
+        if radius == 0:
+            yield center
+            return
+        for c in range(col - radius, col + radius + 1):
+            yield c, row - radius
+            yield c, row + radius
+        for r in range(row - radius + 1, row + radius):
+            yield col - radius, r
+            yield col + radius, r
+
+    def nearest(self, point, keep=None):
+        """
+        Return (item, distance) for the nearest item to point, or (None, inf) when the
+        index is empty. Items for which keep(item) is false are deleted from the index
+        on the way, so keep must describe a condition that never becomes true again
+        (for example "still fits in the truck"). Ties go to the lowest item.
+        """
+        best, best_distance = None, float('inf')
+        center = self._cell(point)
+        max_radius = max(self.cols, self.rows)
+        radius = 0
+
+        while self.cells and radius <= max_radius:
+            # Once the ring holds more cells than are left, scan what is left directly
+            ring_cells = 8 * radius if radius else 1
+            if ring_cells >= len(self.cells):
+                cells = list(self.cells)
+                radius = max_radius
+            else:
+                cells = [cell for cell in self._ring(center, radius) if cell in self.cells]
+
+            for cell in cells:
+                for i in list(self.cells.get(cell, ())):
+                    if keep is not None and not keep(i):
+                        self.remove(i)
+                        continue
+                    x, y = self.points[i]
+                    d = math.hypot(x - point[0], y - point[1])
+                    if d < best_distance or (d == best_distance and i < best):
+                        best, best_distance = i, d
+
+            # Every cell beyond this ring is at least radius * cell_size away
+            if best is not None and best_distance <= radius * self.cell_size:
+                break
+            radius += 1
+
+        return best, best_distance
+
+
+def nearest_centroids(points, centroids, method="auto", chunk_size=1_000_000):
+    """
+    Index of the nearest centroid for every point, ties going to the first centroid.
+
+    method "brute" takes a batched argmin over a points x centroids array of squared
+    distances, processed in chunks of about chunk_size cells so memory stays bounded.
+    method "kdtree" answers the same Voronoi-cell query with SciPy's cKDTree, which
+    pays off once there are hundreds of centroids. "auto" picks the KD-tree for at
+    least KDTREE_MIN_CENTROIDS centroids when SciPy is installed.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    centroids = np.asarray(centroids, dtype=np.float64).reshape(-1, 2)
+
+    if method == "auto":
+        method = "brute"
+        if len(centroids) >= KDTREE_MIN_CENTROIDS:
+            try:
+                import scipy.spatial  # noqa: F401
+                method = "kdtree"
+            except ImportError:
+                pass
+
+    if method == "kdtree":
+        from scipy.spatial import cKDTree
+        distances, nearest = cKDTree(centroids).query(points, k=2)
+        nearest = np.asarray(nearest[:, 0], dtype=np.intp)
+        # The tree returns tied centroids in any order, so points on a cell border
+        # are settled by the brute argmin, which keeps the first
+        tied = distances[:, 1] <= distances[:, 0]
+        if tied.any():
+            nearest[tied] = nearest_centroids(points[tied], centroids, "brute", chunk_size)
+        return nearest
+    if method != "brute":
+        raise ValueError(f"Unknown nearest centroid method: {method}")
+
+    nearest = np.empty(len(points), dtype=np.intp)
+    rows = max(chunk_size // max(len(centroids), 1), 1)
+    cx, cy = centroids[:, 0], centroids[:, 1]
+    for start in range(0, len(points), rows):
+        chunk = points[start:start + rows]
+        d2 = (chunk[:, :1] - cx) ** 2 + (chunk[:, 1:] - cy) ** 2
+        nearest[start:start + rows] = d2.argmin(axis=1)
+    return nearest
+
+
+def nearest_neighbors(points, k, method="auto", chunk_size=1_000_000):
+    """
+    Indices of the k nearest other points of every point, nearest first, as an
+    (n, k) array; k is capped at n - 1.
+
+    method works as in nearest_centroids: "brute" takes a chunked argpartition over
+    rows of squared distances, "kdtree" queries SciPy's cKDTree, and "auto" picks
+    the KD-tree for at least KDTREE_MIN_CENTROIDS points when SciPy is installed.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    n = len(points)
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.empty((n, 0), dtype=np.intp)
+
+    if method == "auto":
+        method = "brute"
+        if n >= KDTREE_MIN_CENTROIDS:
+            try:
+                import scipy.spatial  # noqa: F401
+                method = "kdtree"
+            except ImportError:
+                pass
+
+    if method == "kdtree":
+        from scipy.spatial import cKDTree
+        # The closest hit is the point itself; ask for one more and drop it
+        _, found = cKDTree(points).query(points, k + 1)
+        found = np.asarray(found, dtype=np.intp).reshape(n, k + 1)
+        own = found == np.arange(n)[:, None]
+        # Duplicate locations can put the point itself in a later column
+        own[~own.any(axis=1), -1] = True
+        return found[~own].reshape(n, k)
+    if method != "brute":
+        raise ValueError(f"Unknown nearest neighbor method: {method}")
+
+    neighbors = np.empty((n, k), dtype=np.intp)
+    rows = max(chunk_size // n, 1)
+    px, py = points[:, 0], points[:, 1]
+    for start in range(0, n, rows):
+        chunk = points[start:start + rows]
+        d2 = (chunk[:, :1] - px) ** 2 + (chunk[:, 1:] - py) ** 2
+        d2[np.arange(len(chunk)), np.arange(start, start + len(chunk))] = np.inf
+        part = np.argpartition(d2, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(d2, part, axis=1).argsort(axis=1, kind="stable")
+        neighbors[start:start + rows] = np.take_along_axis(part, order, axis=1)
+    return neighbors
@@ -0,0 +1,291 @@
+import argparse
+import asyncio
+import csv
+import functools
+import os
+import time
+from main import assign_bins_to_districts, create_trucks, load_districts_from_csv, load_waste_bins_from_csv
+from route_optimization import assign_trucks_to_districts, optimize_route_dp
+
+
+def parse_reading(line):
+    """Parse a "bin_id,fill_level" line into a reading, or None if it is malformed"""
+    parts = line.strip().split(",")
+    if len(parts) != 2:
+        return None
+    try:
+        return parts[0].strip(), float(parts[1])
+    except ValueError:
+        return None
+
+
+class TelemetryService:
+    """
+    Asyncio ingestion loop for bin fill-level readings.
+
+    Sources put (bin_id, fill_level) readings on a bounded queue, so a slow planner
+    pushes back on them instead of buffering without limit. The consumer drains the
+    queue into micro-batches, keeps only the latest reading per bin, applies them
+    to the bins and re-plans through assign_trucks_to_districts at most once every
+    replan_interval seconds. Planning runs in a worker thread; readings that arrive
+    meanwhile are held back and applied once it finishes.
+    """
+
+    def __init__(self, districts, trucks_factory=create_trucks, queue_size=10000, batch_size=1000,
+                 batch_window=0.05, replan_interval=5.0, planner_options=None):
+        self.districts = districts
+        self.trucks_factory = trucks_factory
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.replan_interval = replan_interval
+        self.planner_options = planner_options or {}
+        self.bins = {bin.bin_id: bin for district in districts for bin in district.waste_bins}
+
+        self.assignments = {}
+        self.pending = {}
+        self.dirty = False
+        self.last_plan = 0.0
+        self.planning = None
+
+        self.started = time.perf_counter()
+        self.last_reading = self.started
+        self.readings = 0
+        self.applied = 0
+        self.unknown = 0
+        self.batches = 0
+        self.plan_latencies = []
+
+    async def submit(self, reading):
+        """Queue one reading, waiting while the queue is full"""
+        await self.queue.put(reading)
+
+    async def run(self, stop_event):
+        """Consume readings until stop_event is set and the queue is drained"""
+        while not (stop_event.is_set() and self.queue.empty()):
+            batch = await self._next_batch(stop_event)
+            if batch:
+                self.batches += 1
+                self.readings += len(batch)
+                for bin_id, level in batch:
+                    self.pending[bin_id] = level
+            await self._maybe_replan()
+        if self.planning:
+            await self.planning
+        self._apply_pending()
+        if self.dirty:
+            await self._replan()
+
+    async def _next_batch(self, stop_event):
+        # Wait up to batch_window for the first reading, then take whatever else is queued
+        batch = []
+        if self.queue.empty():
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), self.batch_window))
+            except asyncio.TimeoutError:
+                return batch
+        while len(batch) < self.batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        if batch:
+            self.last_reading = time.perf_counter()
+        return batch
+
+    def _apply_pending(self):
+        for bin_id, level in self.pending.items():
+            bin = self.bins.get(bin_id)
+            if bin is None:
+                self.unknown += 1
+                continue
+            bin.current_level = level
+            self.applied += 1
+            self.dirty = True
+        self.pending.clear()
+
+    async def _maybe_replan(self):
+        if self.planning and self.planning.done():
+            await self.planning
+            self.planning = None
+        if self.planning:
+            return
+        self._apply_pending()
+        if self.dirty and time.perf_counter() - self.last_plan >= self.replan_interval:
+            self.planning = asyncio.ensure_future(self._replan())
+
+    async def _replan(self):
+        self.dirty = False
+        self.last_plan = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        options = dict(self.planner_options, verbose=False)
+        self.assignments = await loop.run_in_executor(
+            None, lambda: assign_trucks_to_districts(self.trucks_factory(), self.districts, **options))
+        self.plan_latencies.append(time.perf_counter() - self.last_plan)
+
+    def stats(self):
+        """Ingest throughput (up to the latest reading) and plan latency so far"""
+        elapsed = time.perf_counter() - self.started
+        ingest_time = self.last_reading - self.started
+        latencies = sorted(self.plan_latencies)
+        return {
+            "elapsed": elapsed,
+            "readings": self.readings,
+            "applied": self.applied,
+            "unknown_bins": self.unknown,
+            "batches": self.batches,
+            "readings_per_second": self.readings / ingest_time if ingest_time > 0 else 0.0,
+            "plans": len(latencies),
+            "plan_latency_mean": sum(latencies) / len(latencies) if latencies else 0.0,
+            "plan_latency_max": latencies[-1] if latencies else 0.0,
+            "queue_depth": self.queue.qsize(),
+        }
+
+
+async def replay_source(service, path="Smart_Bin.csv", rate=1000.0, column="FL_A", max_rows=None):
+    """
+    Stream a column of Smart_Bin.csv as readings at `rate` readings per second.
+    Row n becomes bin "bin-n", matching load_waste_bins_from_csv.
+    """
+    interval = 1.0 / rate if rate else 0.0
+    start = time.perf_counter()
+    with open(path, 'r', newline='') as f:
+        for n, row in enumerate(csv.DictReader(f), start=1):
+            if max_rows is not None and n > max_rows:
+                break
+            if not row[column]:
+                continue
+            await service.submit((f"bin-{n}", float(row[column])))
+            # Sleep only when ahead of schedule, so the pace holds without a sleep per reading
+            delay = start + n * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+
+async def tail_source(service, path, stop_event, poll_interval=0.2):
+    """Follow a file of "bin_id,fill_level" lines, like tail -f"""
+    with open(path, 'r') as f:
+        f.seek(0, os.SEEK_END)
+        while not stop_event.is_set():
+            line = f.readline()
+            if not line:
+                await asyncio.sleep(poll_interval)
+                continue
+            reading = parse_reading(line)
+            if reading:
+                await service.submit(reading)
+
+
+async def _handle_stream(service, reader, writer):
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        reading = parse_reading(line.decode(errors="replace"))
+        if reading:
+            await service.submit(reading)
+    writer.close()
+
+
+async def start_socket_source(service, host=None, port=None, unix_path=None):
+    """
+    Accept "bin_id,fill_level" lines over TCP or a Unix socket. Slow consumers
+    throttle clients, because each line waits for room in the service queue.
+    """
+    handler = lambda reader, writer: _handle_stream(service, reader, writer)
+    if unix_path:
+        return await asyncio.start_unix_server(handler, path=unix_path)
+    return await asyncio.start_server(handler, host or "127.0.0.1", port)
+
+
+async def serve(args):
+    districts = assign_bins_to_districts(load_districts_from_csv(), load_waste_bins_from_csv(max_bins=args.max_bins or None))
+    service = TelemetryService(
+        districts,
+        queue_size=args.queue_size,
+        batch_size=args.batch_size,
+        batch_window=args.batch_window,
+        replan_interval=args.replan_interval,
+        planner_options={
+            "solver": functools.partial(optimize_route_dp, time_limit=args.time_limit),
+            "local_search_time": args.local_search_time,
+        },
+    )
+    stop_event = asyncio.Event()
+    consumer = asyncio.ensure_future(service.run(stop_event))
+
+    producers = []
+    servers = []
+    if args.replay:
+        producers.append(asyncio.ensure_future(
+            replay_source(service, args.replay, args.rate, args.column, args.max_bins or None)))
+    if args.tail:
+        producers.append(asyncio.ensure_future(tail_source(service, args.tail, stop_event)))
+    if args.tcp:
+        host, _, port = args.tcp.rpartition(":")
+        servers.append(await start_socket_source(service, host=host or None, port=int(port)))
+    if args.unix:
+        servers.append(await start_socket_source(service, unix_path=args.unix))
+
+    async def report():
+        while not stop_event.is_set():
+            await asyncio.sleep(args.report_interval)
+            stats = service.stats()
+            print(f"[{stats['elapsed']:.1f}s] {stats['readings']} readings "
+                  f"({stats['readings_per_second']:,.0f}/s), {stats['plans']} plans, "
+                  f"plan latency mean {stats['plan_latency_mean']:.3f}s max {stats['plan_latency_max']:.3f}s, "
+                  f"queue {stats['queue_depth']}")
+
+    reporter = asyncio.ensure_future(report())
+    try:
+        if args.duration:
+            await asyncio.sleep(args.duration)
+        elif producers and not (args.tail or servers):
+            await asyncio.gather(*producers)
+        else:
+            await asyncio.Event().wait()
+    finally:
+        stop_event.set()
+        for server in servers:
+            server.close()
+        for producer in producers:
+            producer.cancel()
+        await consumer
+        reporter.cancel()
+
+    stats = service.stats()
+    print(f"Ingested {stats['readings']} readings in {stats['batches']} batches "
+          f"({stats['readings_per_second']:,.0f} readings/s), {stats['unknown_bins']} for unknown bins")
+    print(f"Re-planned {stats['plans']} times, latency mean {stats['plan_latency_mean']:.3f}s "
+          f"max {stats['plan_latency_max']:.3f}s")
+    return service
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Live bin telemetry ingestion with batched re-planning")
+    parser.add_argument("--replay", metavar="CSV", help="replay a Smart_Bin.csv file as live readings")
+    parser.add_argument("--rate", type=float, default=1000.0,
+                        help="replay rate in readings per second, 0 for as fast as possible (default: 1000)")
+    parser.add_argument("--column", default="FL_A", help="CSV column replayed as the fill level (default: FL_A)")
+    parser.add_argument("--tail", metavar="FILE", help='follow a file of "bin_id,fill_level" lines')
+    parser.add_argument("--tcp", metavar="[HOST:]PORT", help='accept "bin_id,fill_level" lines over TCP')
+    parser.add_argument("--unix", metavar="PATH", help='accept "bin_id,fill_level" lines on a Unix socket')
+    parser.add_argument("--max-bins", type=int, default=0,
+                        help="number of bins to load from Smart_Bin.csv, 0 for the whole file (default: 0)")
+    parser.add_argument("--queue-size", type=int, default=10000, help="readings buffered before sources wait (default: 10000)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="largest micro-batch (default: 1000)")
+    parser.add_argument("--batch-window", type=float, default=0.05,
+                        help="seconds a micro-batch waits to fill up (default: 0.05)")
+    parser.add_argument("--replan-interval", type=float, default=5.0,
+                        help="minimum seconds between re-plans (default: 5)")
+    parser.add_argument("--time-limit", type=float, default=1.0,
+                        help="route solver time limit per district when re-planning (default: 1)")
+    parser.add_argument("--local-search-time", type=float, default=0.2,
+                        help="local search budget per route when re-planning (default: 0.2)")
+    parser.add_argument("--report-interval", type=float, default=5.0, help="seconds between progress reports (default: 5)")
+    parser.add_argument("--duration", type=float, default=0, help="stop after this many seconds (default: run until done)")
+    args = parser.parse_args(argv)
+    if not (args.replay or args.tail or args.tcp or args.unix):
+        parser.error("give at least one source: --replay, --tail, --tcp or --unix")
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(serve(parse_args()))